@@ -1,21 +1,25 @@
 import pandas as pd
 import matplotlib.pyplot as plt
-from utils_io import load_csv
+from utils_io import load_csv, load_results, load_table
 from utils_metrics import compute_hit_percentage, compute_cost_per_gain
+from surrogate import fit_surrogate
 import numpy as np
 
+# Angles per axis of the grids the response surrogate is evaluated over
+SURROGATE_GRID_POINTS = 361
+
 
 def get_sim_title():
     try:
-        df = load_csv("../data/results.csv")
+        df = load_table("../data", "results")
         return df["sim title"].iloc[-1]
     except:
         return "Simulation"
 
 
 def plot_hit_percentage_combined():
-    df = load_csv("../data/results.csv")
-    sensor_df = load_csv("../data/sensor_results.csv")
+    df = load_table("../data", "results")
+    sensor_df = load_table("../data", "sensor_results")
     sim_title = get_sim_title()
 
     fig, axs = plt.subplots(1, 2, figsize=(14, 5))
@@ -57,7 +61,7 @@ def plot_hit_percentage_combined():
 
 
 def plot_runtime_vs_gain():
-    df = load_csv("../data/results.csv")
+    df = load_results("../data")
     grouped = df.groupby("ray count").agg({
         "hits": "sum",
         "misses": "sum",
@@ -90,13 +94,24 @@ def plot_runtime_vs_gain():
     plt.show()
 
 
-def compare_sim_vs_real():
-    sim_df = load_csv("../data/sensor_results.csv")
+def compare_sim_vs_real(use_surrogate=False):
+    """
+    With use_surrogate, the simulated curve is the response surrogate (surrogate.py) along the arc
+    at the first tilt angle, instead of the simulated poses.
+    """
     phy_df = load_csv("../data/physical_data_messy.csv")
-    angle_df = load_csv("../data/rigid_arc_angles.csv")
 
-    sim_data = sim_df.iloc[:, 2:] / sim_df.iloc[:, 2:].sum(axis=1).values[:, None] * 100
-    sim_pos = angle_df['arc_angle_deg'].unique()
+    if use_surrogate:
+        surrogate, angle_df, _, _ = fit_surrogate("../data")
+        sim_pos = np.linspace(angle_df["arc_angle_deg"].min(), angle_df["arc_angle_deg"].max(), SURROGATE_GRID_POINTS)
+        sim_responses = surrogate.predict(angle_df["tilt_angle_deg"].iloc[0], sim_pos)
+    else:
+        sim_df = load_table("../data", "sensor_results")
+        angle_df = load_table("../data", "rigid_arc_angles")
+        sim_responses = sim_df.iloc[:, 2:]
+        sim_pos = angle_df['arc_angle_deg'].unique()
+
+    sim_data = sim_responses / sim_responses.sum(axis=1).values[:, None] * 100
 
     phy_filtered = phy_df.iloc[:, 6:]
     phy_time = phy_df.iloc[:, 1]
@@ -121,12 +136,24 @@ def compare_sim_vs_real():
     plt.show()
 
 
-def sensor_surface_plots():
+def sensor_surface_plots(use_surrogate=False):
+    """
+    With use_surrogate, each surface is the response surrogate (surrogate.py) over a fine grid of angles,
+    with the simulated poses drawn as points, instead of the grid of simulated poses.
+    """
+    if use_surrogate:
+        surrogate, angle_df, sensor_data, _ = fit_surrogate("../data")
 
-    angle_df = load_csv("../data/rigid_arc_angles.csv")
-    sensor_df = load_csv("../data/sensor_results.csv")
+        tilts = np.unique(angle_df["tilt_angle_deg"])
+        if len(tilts) > 1:
+            tilts = np.linspace(tilts.min(), tilts.max(), SURROGATE_GRID_POINTS)
+        arcs = np.linspace(angle_df["arc_angle_deg"].min(), angle_df["arc_angle_deg"].max(), SURROGATE_GRID_POINTS)
+        predicted = surrogate.predict_grid(tilts, arcs)
+    else:
+        angle_df = load_table("../data", "rigid_arc_angles")
+        sensor_data = load_table("../data", "sensor_results").iloc[:, 2:]  # exclude sim and idx
 
-    num_sensors = sensor_df.shape[1] - 2  # exclude sim and idx
+    num_sensors = sensor_data.shape[1]
     cols = int(np.ceil(np.sqrt(num_sensors)))
     rows = int(np.ceil(num_sensors / cols))
 
@@ -136,15 +163,19 @@ def sensor_surface_plots():
     else:
         axes = [axes]
 
-    sensor_data = sensor_df.iloc[:, 2:]
-
     for idx in range(num_sensors):
-        combined = angle_df.copy()
-        combined["sensor_response"] = sensor_data.iloc[:, idx].values
+        if use_surrogate:
+            X, Y = np.meshgrid(arcs, tilts)
+            Z = predicted[:, :, idx]
+            axes[idx].scatter(angle_df["arc_angle_deg"], angle_df["tilt_angle_deg"], sensor_data.iloc[:, idx],
+                              color="black", s=2)
+        else:
+            combined = angle_df.copy()
+            combined["sensor_response"] = sensor_data.iloc[:, idx].values
 
-        pivot = combined.pivot(index="tilt_angle_deg", columns="arc_angle_deg", values="sensor_response")
-        X, Y = np.meshgrid(pivot.columns.values, pivot.index.values)
-        Z = pivot.values
+            pivot = combined.pivot(index="tilt_angle_deg", columns="arc_angle_deg", values="sensor_response")
+            X, Y = np.meshgrid(pivot.columns.values, pivot.index.values)
+            Z = pivot.values
 
         axes[idx].plot_surface(X, Y, Z, cmap='plasma')
         axes[idx].set_title(f"Sensor {sensor_data.columns[idx]}")
@@ -157,8 +188,8 @@ def sensor_surface_plots():
     plt.show()
 
 def plot_per_test_summary():
-    df = load_csv("../data/results.csv")
-    sensor_df = load_csv("../data/sensor_results.csv")
+    df = load_table("../data", "results")
+    sensor_df = load_table("../data", "sensor_results")
 
     if "sim title" not in df.columns:
         print("Missing 'sim title' column in results.csv")
@@ -207,7 +238,10 @@ def menu():
         "3": ("Compare Simulated vs Real Sensor Data", compare_sim_vs_real),
         "4": ("Generate Sensor Response Surface Plots", sensor_surface_plots),
         "5": ("Plot Overall and Per-Sensor Hit % by Test Case", plot_per_test_summary),
-        "6": ("Exit", exit)
+        "6": ("Generate Sensor Response Surface Plots from the Surrogate",
+              lambda: sensor_surface_plots(use_surrogate=True)),
+        "7": ("Compare Surrogate Simulated vs Real Sensor Data", lambda: compare_sim_vs_real(use_surrogate=True)),
+        "8": ("Exit", exit)
     }
 
     while True:
@@ -0,0 +1,38 @@
+import argparse
+import os
+
+from utils_io import load_table
+
+# Tables written by the simulation, and the legacy CSV file each one replaces
+TABLES = ["results", "sensor_results", "rigid_arc_angles"]
+
+
+def export_results(data_dir="../data", output_dir=None):
+    """
+    Converts the columnar results store back into the legacy CSV files, for tools that still read them.
+
+    Args:
+        data_dir (str): Data directory holding the store.
+        output_dir (str): Directory for the CSV files, defaults to data_dir (replacing any existing CSV files).
+    """
+    output_dir = output_dir or data_dir
+    os.makedirs(output_dir, exist_ok=True)
+
+    for name in TABLES:
+        if not os.path.isdir(os.path.join(data_dir, "store", name)):
+            print(f"No stored {name} table, skipping")
+            continue
+
+        df = load_table(data_dir, name)
+        output_path = os.path.join(output_dir, f"{name}.csv")
+        df.to_csv(output_path, index=False)
+        print(f"Wrote {len(df)} rows to {output_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the columnar results store as CSV files")
+    parser.add_argument("--data", default="../data", help="Data directory holding the store")
+    parser.add_argument("--output", default=None, help="Directory for the CSV files (default: the data directory)")
+    args = parser.parse_args()
+
+    export_results(args.data, args.output)
@@ -4,12 +4,12 @@ import os
 
 import matplotlib.pyplot as plt
 import pandas as pd
-from evaluation.utils_io import load_csv
+from evaluation.utils_io import load_csv, load_results, load_table
 
 from evaluation.utils_metrics import compute_hit_percentage, compute_cost_per_gain
 
 def plot_overall_hit_percentage():
-    df = load_csv("C:/Users/temp/IdeaProjects/MENGProject/data/results.csv")
+    df = load_table("C:/Users/temp/IdeaProjects/MENGProject/data", "results")
 
     fig, axs = plt.subplots(1, 2, figsize=(12, 5))
 
@@ -33,7 +33,7 @@ def plot_overall_hit_percentage():
 
 
 def plot_sensor_hit_distribution(axs):
-    df = load_csv("C:/Users/temp/IdeaProjects/MENGProject/data/sensor_results.csv")
+    df = load_table("C:/Users/temp/IdeaProjects/MENGProject/data", "sensor_results")
 
     melted = df.melt(id_vars=["sim", "idx"], var_name="sensor", value_name="hits")
     totals = melted.groupby(["sim", "idx"])["hits"].sum().reset_index(name="total_hits")
@@ -57,7 +57,7 @@ def plot_sensor_hit_distribution(axs):
 
 
 def plot_runtime_vs_gain():
-    df = load_csv("C:/Users/temp/IdeaProjects/MENGProject/data/results.csv")
+    df = load_results("C:/Users/temp/IdeaProjects/MENGProject/data")
     grouped = df.groupby("ray count").agg({
         "hits": "sum",
         "misses": "sum",
@@ -107,14 +107,14 @@ def define_plot(ax, sensor_df, x_data, title, x_label, y_label):
     ax.grid(True)
 
 def compare_sim_vs_real():
-    sim_df = load_csv('C:/Users/temp/IdeaProjects/MENGProject/data/sensor_results.csv')
+    sim_df = load_table('C:/Users/temp/IdeaProjects/MENGProject/data', 'sensor_results')
     sim_sensor, sim_pos = prepare_result_data(sim_df, 2)
 
     phy_df = load_csv('C:/Users/temp/IdeaProjects/MENGProject/data/physical_data_messy.csv')
     phy_sensor_filtered, phy_pos_filtered = prepare_result_data(phy_df, 6)
     phy_sensor_noisy, phy_pos_noisy = prepare_result_data(phy_df, 2, 6)
 
-    angle_df = load_csv('C:/Users/temp/IdeaProjects/MENGProject/data/rigid_arc_angles.csv')
+    angle_df = load_table('C:/Users/temp/IdeaProjects/MENGProject/data', 'rigid_arc_angles')
     sim_sensor_percent = (sim_sensor / sim_sensor.sum(axis=1).values[:, None]) * 100
     arc_angles = angle_df['arc_angle_deg'].unique()
 
@@ -0,0 +1,265 @@
+"""
+Response surface surrogate of the rigid arc: a smooth model of each sensor's response over tilt and arc angle,
+fitted to the poses of one simulation, predicting the response at any other angles without tracing rays.
+
+Two kinds of model:
+    rbf: radial basis function interpolation (scipy RBFInterpolator). Poses may be scattered, e.g. from arc
+        refinement, and every sensor is predicted by one evaluation.
+    spline: tensor product smoothing splines (scipy RectBivariateSpline), one per sensor. Poses must form a full
+        tilt x arc grid.
+With a single tilt angle, both model the response over the arc angle alone.
+
+The held-out error is measured by refitting without every few arc angles and predicting the responses there.
+
+Run from the evaluation directory to fit the latest simulation and report the held-out error:
+    python surrogate.py --method rbf --smoothing 1
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.interpolate import RBFInterpolator, RectBivariateSpline, UnivariateSpline
+
+from utils_io import load_table
+
+METHODS = ["rbf", "spline"]
+
+
+def load_pose_responses(data_dir="../data"):
+    """
+    Angles and sensor responses of every pose of the latest simulation.
+
+    Returns:
+        angles (pd.DataFrame): tilt_angle_deg and arc_angle_deg of each pose.
+        responses (pd.DataFrame): Hits on each sensor at each pose.
+    """
+    angle_df = load_table(data_dir, "rigid_arc_angles")
+    sensor_df = load_table(data_dir, "sensor_results")
+
+    # Earlier simulations may share the sensor table, the angle table only holds the latest
+    sensor_df = sensor_df[sensor_df["sim"] == sensor_df["sim"].iloc[-1]]
+    if len(sensor_df) != len(angle_df):
+        raise ValueError(f"{len(sensor_df)} sensor results for {len(angle_df)} rigid arc angles, "
+                         f"the latest simulation was not a rigid arc")
+
+    angles = angle_df[["tilt_angle_deg", "arc_angle_deg"]].reset_index(drop=True)
+    responses = sensor_df.iloc[:, 2:].reset_index(drop=True).astype(float)
+
+    return angles, responses
+
+
+class ResponseSurrogate:
+    """
+    Smooth model of each sensor's response over tilt and arc angle.
+
+    Attributes:
+    method (str): "rbf" or "spline".
+    smoothing (float): 0 interpolates the simulated responses exactly, larger values smooth out ray noise.
+        For splines, roughly the mean squared residual allowed at each pose.
+    kernel (str): RBF kernel, see scipy RBFInterpolator.
+    neighbors (int): For rbf, fit each prediction to this many nearest poses instead of all of them, for large sweeps.
+    sensors (list): Sensor names, the columns of the predictions.
+    tilt_varies (bool): False when fitted to a single tilt angle, which predictions then ignore.
+    """
+
+    def __init__(self, method="rbf", smoothing=0.0, kernel="thin_plate_spline", neighbors=None):
+        if method not in METHODS:
+            raise ValueError(f"Unknown surrogate method {method}, expected one of {METHODS}")
+
+        self.method = method
+        self.smoothing = smoothing
+        self.kernel = kernel
+        self.neighbors = neighbors
+        self.sensors = []
+        self.tilt_varies = False
+        self.models = None
+
+    def fit(self, angles, responses):
+        """
+        Fits the model to simulated poses.
+
+        Args:
+            angles (pd.DataFrame): tilt_angle_deg and arc_angle_deg of each pose, from load_pose_responses().
+            responses (pd.DataFrame): Response of each sensor at each pose.
+
+        Returns:
+            ResponseSurrogate: self.
+        """
+        tilt = angles["tilt_angle_deg"].to_numpy(float)
+        arc = angles["arc_angle_deg"].to_numpy(float)
+        values = responses.to_numpy(float)
+
+        self.sensors = list(responses.columns)
+        self.tilt_varies = len(np.unique(tilt)) > 1
+
+        if self.method == "rbf":
+            self.models = RBFInterpolator(self._points(tilt, arc), values, kernel=self.kernel,
+                                          smoothing=self.smoothing, neighbors=self.neighbors)
+        elif self.tilt_varies:
+            self.models = self._fit_grid_splines(tilt, arc, values)
+        else:
+            order = np.argsort(arc)
+            self.models = [UnivariateSpline(arc[order], values[order, idx], k=min(3, len(arc) - 1),
+                                            s=self.smoothing * len(arc)) for idx in range(values.shape[1])]
+
+        return self
+
+    def _points(self, tilt, arc):
+        """
+        (n,2) or (n,1) model coordinates of each pose.
+        """
+        return np.column_stack((tilt, arc)) if self.tilt_varies else np.asarray(arc, dtype=float)[:, None]
+
+    def _fit_grid_splines(self, tilt, arc, values):
+        """
+        One RectBivariateSpline per sensor over the tilt x arc grid of the poses.
+        """
+        tilts, tilt_index = np.unique(tilt, return_inverse=True)
+        arcs, arc_index = np.unique(arc, return_inverse=True)
+
+        grid = np.full((len(tilts), len(arcs), values.shape[1]), np.nan)
+        grid[tilt_index, arc_index] = values
+        if np.isnan(grid).any():
+            raise ValueError("Spline surrogates need a full tilt x arc grid of poses, use the rbf method instead")
+
+        kx, ky = min(3, len(tilts) - 1), min(3, len(arcs) - 1)
+        return [RectBivariateSpline(tilts, arcs, grid[:, :, idx], kx=kx, ky=ky, s=self.smoothing * grid[:, :, idx].size)
+                for idx in range(values.shape[1])]
+
+    def predict(self, tilt, arc):
+        """
+        Predicted response of each sensor at each pair of angles.
+
+        Args:
+            tilt (np.array): (n,) tilt angles, or a single angle for every arc angle.
+            arc (np.array): (n,) arc angles.
+
+        Returns:
+            pd.DataFrame: (n, sensors) predicted responses, clipped at 0 where a model overshoots below it.
+        """
+        if self.models is None:
+            raise RuntimeError("The surrogate has not been fitted")
+
+        arc = np.atleast_1d(np.asarray(arc, dtype=float))
+        tilt = np.broadcast_to(np.asarray(tilt, dtype=float), arc.shape)
+
+        if self.method == "rbf":
+            try:
+                values = self.models(self._points(tilt, arc))
+            except np.linalg.LinAlgError as error:
+                # With neighbors, each prediction is fitted to its nearest poses, which may all share one tilt
+                raise ValueError(f"Singular rbf surrogate ({error}), each neighbourhood must span more than "
+                                 f"one tilt angle, raise neighbors") from error
+        elif self.tilt_varies:
+            values = np.column_stack([model.ev(tilt, arc) for model in self.models])
+        else:
+            values = np.column_stack([model(arc) for model in self.models])
+
+        return pd.DataFrame(np.maximum(values, 0.0), columns=self.sensors)
+
+    def predict_grid(self, tilts, arcs):
+        """
+        Predicted responses over a tilt x arc grid.
+
+        Returns:
+            np.array: (len(tilts), len(arcs), sensors) predicted responses.
+        """
+        tilt_grid, arc_grid = np.meshgrid(tilts, arcs, indexing="ij")
+        values = self.predict(tilt_grid.ravel(), arc_grid.ravel()).to_numpy()
+
+        return values.reshape(len(tilts), len(arcs), -1)
+
+
+def held_out_error(angles, responses, holdout_every=5, **surrogate_options):
+    """
+    Error of the surrogate at poses left out of its fit.
+
+    Every holdout_every-th arc angle, away from the ends of the arc, is left out at every tilt, so spline grids stay
+    complete and no held-out pose needs extrapolating. The surrogate is fitted to the remaining poses, so the error
+    is somewhat pessimistic for a fit to every pose.
+
+    Args:
+        angles (pd.DataFrame): tilt_angle_deg and arc_angle_deg of each pose.
+        responses (pd.DataFrame): Response of each sensor at each pose.
+        holdout_every (int): Spacing of the held-out arc angles.
+        **surrogate_options: Arguments of ResponseSurrogate.
+
+    Returns:
+        pd.DataFrame: RMSE and largest absolute error of each sensor, also as percentages of its peak response.
+    """
+    arcs = np.unique(angles["arc_angle_deg"])
+    held_out_arcs = arcs[holdout_every:-1:holdout_every]
+    held_out = angles["arc_angle_deg"].isin(held_out_arcs).to_numpy()
+    if not held_out.any():
+        raise ValueError(f"Too few arc angles ({len(arcs)}) to hold out every {holdout_every}th")
+
+    surrogate = ResponseSurrogate(**surrogate_options).fit(angles[~held_out], responses[~held_out])
+    predicted = surrogate.predict(angles.loc[held_out, "tilt_angle_deg"], angles.loc[held_out, "arc_angle_deg"])
+
+    errors = predicted.to_numpy() - responses[held_out].to_numpy()
+    peaks = np.maximum(responses.abs().max().to_numpy(), 1e-12)
+
+    report = pd.DataFrame({
+        "rmse": np.sqrt(np.mean(errors ** 2, axis=0)),
+        "max_abs": np.abs(errors).max(axis=0),
+    }, index=responses.columns)
+    report["rmse_pct_peak"] = report["rmse"] / peaks * 100
+    report["max_abs_pct_peak"] = report["max_abs"] / peaks * 100
+    report.index.name = "sensor"
+
+    return report
+
+
+def fit_surrogate(data_dir="../data", holdout_every=5, report=True, **surrogate_options):
+    """
+    Fits a surrogate to every pose of the latest simulation, after measuring its held-out error.
+
+    Args:
+        data_dir (str): Data directory of the simulation.
+        holdout_every (int): Spacing of the held-out arc angles, see held_out_error(). 0 skips the measurement.
+        report (bool): Print the held-out error.
+        **surrogate_options: Arguments of ResponseSurrogate.
+
+    Returns:
+        surrogate (ResponseSurrogate): Fitted to every pose.
+        angles, responses (pd.DataFrame): The simulated poses, from load_pose_responses().
+        errors (pd.DataFrame): Held-out error of each sensor, None if skipped.
+    """
+    angles, responses = load_pose_responses(data_dir)
+
+    errors = held_out_error(angles, responses, holdout_every, **surrogate_options) if holdout_every else None
+    if report and errors is not None:
+        print(f"Held-out error of the {surrogate_options.get('method', 'rbf')} surrogate "
+              f"({len(angles)} poses, every {holdout_every}th arc angle held out):")
+        print(errors.round(3).to_string())
+
+    return ResponseSurrogate(**surrogate_options).fit(angles, responses), angles, responses, errors
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fit a response surface surrogate to the latest rigid arc simulation")
+    parser.add_argument("--data", default="../data", help="Data directory of the simulation")
+    parser.add_argument("--method", default="rbf", choices=METHODS, help="Kind of model")
+    parser.add_argument("--smoothing", type=float, default=0.0, help="0 interpolates the simulated poses exactly")
+    parser.add_argument("--kernel", default="thin_plate_spline", help="RBF kernel")
+    parser.add_argument("--neighbors", type=int, default=None, help="Nearest poses per RBF prediction")
+    parser.add_argument("--holdout", type=int, default=5, help="Hold out every Nth arc angle to measure the error")
+    args = parser.parse_args()
+
+    options = {"method": args.method, "smoothing": args.smoothing}
+    if args.method == "rbf":
+        options.update(kernel=args.kernel, neighbors=args.neighbors)
+
+    fitted, pose_angles, _, _ = fit_surrogate(args.data, args.holdout, **options)
+
+    # Time predictions over many random poses
+    rng = np.random.default_rng(0)
+    num_queries = 100000
+    query_tilts = rng.uniform(pose_angles["tilt_angle_deg"].min(), pose_angles["tilt_angle_deg"].max(), num_queries)
+    query_arcs = rng.uniform(pose_angles["arc_angle_deg"].min(), pose_angles["arc_angle_deg"].max(), num_queries)
+
+    start_time = time.perf_counter()
+    fitted.predict(query_tilts, query_arcs)
+    elapsed = time.perf_counter() - start_time
+    print(f"Predicted {num_queries} poses in {elapsed:.3f} s ({elapsed / num_queries * 1e6:.2f} us per pose)")
@@ -1,7 +1,45 @@
+import glob
+
+import numpy as np
 import pandas as pd
 import os
 
 def load_csv(file_path, **kwargs):
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"Missing {file_path}")
-    return pd.read_csv(file_path, **kwargs)
\ No newline at end of file
+    return pd.read_csv(file_path, **kwargs)
+
+
+def load_store_part(part_path):
+    if part_path.endswith(".parquet"):
+        return pd.read_parquet(part_path)
+
+    with np.load(part_path) as part:
+        return pd.DataFrame({column: part[column] for column in part.files})
+
+
+def load_table(data_dir, name):
+    """
+    Loads a results table ("results", "sensor_results", "rigid_arc_angles") from the columnar
+    results store (data/store/<name>) if the simulation wrote one, otherwise from the CSV file.
+    """
+    parts = sorted(glob.glob(os.path.join(data_dir, "store", name, "part-*")))
+    if not parts:
+        return load_csv(os.path.join(data_dir, f"{name}.csv"))
+
+    return pd.concat([load_store_part(part) for part in parts], ignore_index=True)
+
+def load_results(data_dir="../data"):
+    """
+    Loads the results table with the runtime of each simulation taken from the run ledger (runs.csv).
+    Rows written before the ledger existed keep the runtime stored in results.csv.
+    """
+    df = load_table(data_dir, "results")
+
+    runs_path = os.path.join(data_dir, "runs.csv")
+    if os.path.exists(runs_path):
+        runtimes = load_csv(runs_path).set_index("sim")["runtime"]
+        ledger_runtime = df["sim"].map(runtimes)
+        df["runtime"] = df["runtime"].fillna(ledger_runtime) if "runtime" in df.columns else ledger_runtime
+
+    return df
@@ -0,0 +1,77 @@
+import numpy as np
+
+from rayBundle import RayBundle
+from batchIntersection import evaluate_ray_bundle
+
+# Normal quantile of the two-sided 95% confidence interval
+CONFIDENCE_Z = 1.96
+
+
+def wilson_half_width(hits, trials, z=CONFIDENCE_Z):
+    """
+    Half-width of the Wilson score interval of a hit fraction.
+
+    Unlike the normal approximation, the interval stays finite and non-zero when no rays
+    (or every ray) hit, so poses facing away from the apertures converge after the first batch.
+
+    Args:
+        hits (np.array): Hits on each sensor.
+        trials (int): Number of rays fired.
+        z (float): Normal quantile of the confidence level.
+
+    Returns:
+        np.array: Half-width of the interval for each sensor.
+    """
+    hits = np.asarray(hits, dtype=float)
+    fraction = hits / trials
+    z2 = z * z
+
+    return z * np.sqrt(fraction * (1 - fraction) / trials + z2 / (4 * trials * trials)) / (1 + z2 / trials)
+
+
+def evaluate_pose_adaptive(source_plane, sensorPlane, sensorAreas, aperturePlane, apertureAreas, rng, batch_size,
+                           max_lines, tolerance, strategy="uniform", surfaces=()):
+    """
+    Fires batches of rays at a pose until every sensor's hit fraction is known to within the tolerance,
+    or max_lines rays have been fired.
+
+    Each batch is drawn fresh from rng with the given sampling strategy, so the combined batches
+    are an unbiased sample of the source plane.
+
+    Args:
+        source_plane (Plane): Source plane at the current pose.
+        rng (np.random.Generator): Random stream for the ray positions of this pose.
+        batch_size (int): Rays per batch.
+        max_lines (int): Ray cap for the pose.
+        tolerance (float): Target half-width of the 95% confidence interval of each sensor's hit fraction.
+        strategy (str): Sampling strategy, see Plane.random_points().
+        surfaces (list): Optional Surface objects between the aperture plane and the sensor plane.
+
+    Returns:
+        hit: number of hits.
+        miss: number of misses.
+        illumination (np.array): (S,) hits on each sensor.
+        num_lines: number of rays fired.
+    """
+    hit, miss, num_lines = 0, 0, 0
+    illumination = np.zeros(len(sensorAreas), dtype=int)
+
+    while num_lines < max_lines:
+        rays = RayBundle.from_plane(source_plane, min(batch_size, max_lines - num_lines), rng, strategy)
+        rays.update_global_positions(source_plane)
+
+        batch_hit, batch_miss, _, _ = evaluate_ray_bundle(sensorPlane, sensorAreas, aperturePlane, apertureAreas,
+                                                          rays, surfaces)
+        hit += batch_hit
+        miss += batch_miss
+        num_lines += len(rays)
+        illumination += [sensor.illumination for sensor in sensorAreas]
+
+        if np.all(wilson_half_width(illumination, num_lines) <= tolerance):
+            break
+
+    # Leave the sensors holding the totals for the pose, as after a single evaluation
+    for sensor, count in zip(sensorAreas, illumination):
+        sensor.illumination = int(count)
+
+    return hit, miss, illumination, num_lines
@@ -0,0 +1,241 @@
+import numpy as np
+
+from intersectionCalculations import intersection_settings
+
+# Polygons with less area than this (in source plane units squared) are treated as empty
+AREA_EPSILON = 1e-12
+
+
+def polygon_area(polygon):
+    """
+    Signed area of a 2D polygon (shoelace formula), positive for anticlockwise vertex order.
+
+    Args:
+        polygon (list): (x, y) vertices.
+    """
+    if len(polygon) < 3:
+        return 0.0
+
+    total = 0.0
+    x_prev, y_prev = polygon[-1]
+    for x, y in polygon:
+        total += x_prev * y - x * y_prev
+        x_prev, y_prev = x, y
+
+    return 0.5 * total
+
+
+def clip_polygon(subject, clip):
+    """
+    Intersects a polygon with a convex polygon (Sutherland-Hodgman).
+
+    Polygons are lists of (x, y) tuples of floats, the few vertices involved are
+    processed faster as plain floats than as numpy arrays.
+
+    Args:
+        subject (list): Vertices of the polygon to clip.
+        clip (list): Vertices of a convex polygon, in anticlockwise order.
+
+    Returns:
+        list: Vertices of the intersection, empty if they do not overlap.
+    """
+    output = subject
+    start_x, start_y = clip[-1]
+
+    for end_x, end_y in clip:
+        if not output:
+            break
+
+        # Inside is the left of the clip edge
+        edge_x, edge_y = end_x - start_x, end_y - start_y
+        output = clip_half_plane(output, -edge_y, edge_x, edge_y * start_x - edge_x * start_y)
+        start_x, start_y = end_x, end_y
+
+    return output
+
+
+def clip_half_plane(subject, normal_x, normal_y, offset):
+    """
+    Clips a polygon to the half plane normal_x * x + normal_y * y + offset >= 0.
+
+    Args:
+        subject (list): (x, y) vertices of the polygon.
+
+    Returns:
+        list: Vertices of the clipped polygon, empty if none of it is inside.
+    """
+    if not subject:
+        return []
+
+    vertices = []
+    prev_x, prev_y = subject[-1]
+    prev_side = normal_x * prev_x + normal_y * prev_y + offset
+
+    for x, y in subject:
+        side = normal_x * x + normal_y * y + offset
+        if side >= 0:
+            if prev_side < 0:
+                ratio = prev_side / (prev_side - side)
+                vertices.append((prev_x + (x - prev_x) * ratio, prev_y + (y - prev_y) * ratio))
+            vertices.append((x, y))
+        elif prev_side >= 0:
+            ratio = prev_side / (prev_side - side)
+            vertices.append((prev_x + (x - prev_x) * ratio, prev_y + (y - prev_y) * ratio))
+
+        prev_x, prev_y, prev_side = x, y, side
+
+    return vertices
+
+
+def accepted_rays(region, plane, source_plane):
+    """
+    Clips a region of the source plane to the rays whose intersection with a plane passes the configured limits
+    (see intersection_parameters()). Rays parallel to the plane never do, and in strict mode the intersection must
+    not lie behind the ray origin or further than max_distance along the ray.
+
+    Args:
+        region (list): (x, y) vertices in source plane coordinates.
+        plane (Plane): Plane the rays are intersected with.
+        source_plane (Plane): Source plane at the current pose, rays leave along its normal.
+
+    Returns:
+        list: Vertices of the accepted part of the region.
+    """
+    normal_speed = float(np.dot(plane.direction, source_plane.direction))
+    if normal_speed == 0:
+        return []
+    if not intersection_settings["strict_mode"]:
+        return region
+
+    # Ray parameter of the intersection, t0 + slope_x * x + slope_y * y for the ray leaving (x, y)
+    t0 = float(np.dot(plane.direction, plane.position - source_plane.position)) / normal_speed
+    slope_x = -float(np.dot(plane.direction, source_plane.right)) / normal_speed
+    slope_y = -float(np.dot(plane.direction, source_plane.up)) / normal_speed
+
+    region = clip_half_plane(region, slope_x, slope_y, t0)  # Not behind the origin
+
+    max_t = intersection_settings["max_distance"] / float(np.linalg.norm(source_plane.direction))
+    if np.isfinite(max_t):
+        region = clip_half_plane(region, -slope_x, -slope_y, max_t - t0)  # Within max_distance
+
+    return region
+
+
+def grown_corners(area, tolerance):
+    """
+    (4,3) corners of an area grown by the tolerance on every edge, in the order of Areas.update_corners().
+    """
+    half_right = (area.width / 2 + tolerance) * area.right
+    half_up = (area.length / 2 + tolerance) * area.up
+
+    return area.position + np.array([-half_right + half_up, half_right + half_up,
+                                     half_right - half_up, -half_right - half_up])
+
+
+def area_footprints(areas, target_plane, source_plane, tolerance=0.0):
+    """
+    Regions of the source plane whose rays pass through each area.
+
+    The areas' corners, grown by the tolerance, are moved along each area normal onto the plane the rays are
+    intersected with, then projected back along the rays into source plane coordinates. All areas are projected
+    together.
+
+    Returns:
+        list: For each area, anticlockwise (x, y) vertices, empty if the rays run parallel to the target plane.
+    """
+    if len(areas) == 0:
+        return []
+
+    corners = np.array([grown_corners(area, tolerance) for area in areas])  # (A,4,3)
+    normals = np.array([area.normal for area in areas])  # (A,3)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        shift = (np.dot(target_plane.position - corners, target_plane.direction) /
+                 np.dot(normals, target_plane.direction)[:, None])
+    corners = corners + shift[:, :, None] * normals[:, None, :]
+
+    offsets = corners - source_plane.position
+    projected = np.stack((offsets @ source_plane.right, offsets @ source_plane.up), axis=2).tolist()
+
+    footprints = []
+    for footprint in projected:
+        footprint = [tuple(vertex) for vertex in footprint]
+        signed_area = polygon_area(footprint)
+
+        if not np.isfinite(signed_area) or abs(signed_area) < AREA_EPSILON:
+            footprints.append([])
+        else:
+            footprints.append(footprint if signed_area > 0 else footprint[::-1])
+
+    return footprints
+
+
+def expected_illumination(source_plane, sensorPlane, sensorAreas, aperturePlane, apertureAreas):
+    """
+    Exact fraction of a collimated source's rays that reach each sensor, from the overlap of the
+    source rectangle with the footprints of the apertures and sensors. Free of Monte Carlo noise.
+
+    The configured intersection settings apply as when tracing rays: every aperture and sensor is grown by the
+    tolerance, and in strict mode rays are only counted where both intersections are accepted (see accepted_rays()).
+    Apertures, and sensors, are assumed not to overlap each other once grown (a ray is only counted once).
+
+    Args:
+        source_plane (Plane): Source plane at the current pose, rays leave along its normal.
+        sensorPlane: The plane containing the sensors.
+        sensorAreas: List of all sensor objects.
+        aperturePlane: The plane containing the apertures.
+        apertureAreas: List of all aperture objects.
+
+    Returns:
+        np.array: (S,) fraction of the source's rays hitting each sensor.
+    """
+    half_width = source_plane.width / 2
+    half_length = source_plane.length / 2
+    source = [(-half_width, -half_length), (half_width, -half_length),
+              (half_width, half_length), (-half_width, half_length)]
+    source_area = source_plane.width * source_plane.length
+
+    tolerance = intersection_settings["tolerance"]
+
+    fractions = np.zeros(len(sensorAreas))
+
+    # Parts of the source whose rays reach both planes
+    source = accepted_rays(accepted_rays(source, aperturePlane, source_plane), sensorPlane, source_plane)
+    if polygon_area(source) <= AREA_EPSILON:
+        return fractions
+
+    # Parts of the source whose rays pass an aperture
+    passing = []
+    for footprint in area_footprints(apertureAreas, aperturePlane, source_plane, tolerance):
+        if footprint:
+            region = clip_polygon(source, footprint)
+            if polygon_area(region) > AREA_EPSILON:
+                passing.append(region)
+
+    for idx, footprint in enumerate(area_footprints(sensorAreas, sensorPlane, source_plane, tolerance)):
+        if not footprint:
+            continue
+
+        for region in passing:
+            fractions[idx] += max(polygon_area(clip_polygon(region, footprint)), 0.0)
+
+    return fractions / source_area
+
+
+def evaluate_pose_analytic(source_plane, sensorPlane, sensorAreas, aperturePlane, apertureAreas, num_lines):
+    """
+    Expected outcome of firing num_lines rays at a pose, in the same terms as evaluate_line_results().
+
+    Updates the illumination of each sensor area with its expected (fractional) hit count.
+
+    Returns:
+        hit: expected number of hits.
+        miss: expected number of misses.
+    """
+    illumination = num_lines * expected_illumination(source_plane, sensorPlane, sensorAreas, aperturePlane,
+                                                     apertureAreas)
+    for sensor, expected in zip(sensorAreas, illumination):
+        sensor.illumination = float(expected)
+
+    hit = float(illumination.sum())
+    return hit, num_lines - hit
@@ -0,0 +1,83 @@
+"""
+Adaptive angular refinement of the rigid arc.
+
+A coarse sweep (arc_movement.rigid_arc_step) is evaluated first. Poses are then added at the midpoints of the
+intervals where any sensor's response changes sharply between neighbouring poses, round after round, until every
+such interval is no wider than the target resolution. A change is sharp when it is a large enough fraction of
+the sensor's peak response, so sensors receiving few of the rays are refined as finely as the brightest. Flat stretches of the response curve keep the coarse spacing,
+so the edges of the aperture transitions are resolved as finely as a uniform sweep at the target resolution
+from a fraction of the poses.
+
+Structure narrower than the coarse step, with no change between two coarse poses, is not detected.
+"""
+import logging
+
+import numpy as np
+
+
+def intervals_to_refine(angles, responses, threshold, resolution):
+    """
+    Finds the intervals between neighbouring poses to split.
+
+    Args:
+        angles (np.array): (n,) ascending arc angles (degrees).
+        responses (np.array): (n,S) response of each sensor at each angle, as fractions of the rays fired.
+        threshold (float): Change of any sensor's response across an interval, as a fraction of that sensor's peak
+            response, above which the interval is split.
+        resolution (float): Width (degrees) at or below which an interval is not split.
+
+    Returns:
+        np.array: Index i of each interval [angles[i], angles[i + 1]] to split, largest change first.
+    """
+    peaks = np.max(np.abs(responses), axis=0, initial=0.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        relative = np.where(peaks > 0, np.abs(np.diff(responses, axis=0)) / peaks, 0.0)
+    change = np.max(relative, axis=1, initial=0.0)
+    gaps = np.diff(angles)
+
+    split = np.flatnonzero((change > threshold) & (gaps > resolution))
+
+    return split[np.argsort(-change[split], kind="stable")]
+
+
+def refine_arc(evaluate, angles, threshold, resolution, max_poses):
+    """
+    Evaluates a coarse set of arc angles, then recursively inserts poses where the response changes sharply.
+
+    Args:
+        evaluate (callable): evaluate(angles) returning the (n,S) response of each sensor at the given arc angles,
+            as fractions of the rays fired.
+        angles (np.array): Coarse arc angles (degrees).
+        threshold (float): Change of any sensor's response between neighbouring poses, as a fraction of its peak
+            response, above which the interval between them is split.
+        resolution (float): Width (degrees) at or below which an interval is not split.
+        max_poses (int): Most poses to evaluate, the coarse poses included.
+            Once reached, the intervals with the largest changes are split first.
+
+    Returns:
+        angles (np.array): (n,) ascending arc angles of every evaluated pose.
+        responses (np.array): (n,S) response of each sensor at each angle.
+    """
+    angles = np.sort(np.asarray(angles, dtype=float))
+    responses = np.asarray(evaluate(angles), dtype=float)
+    num_coarse = len(angles)
+
+    refinement_round = 0
+    while len(angles) < max_poses:
+        split = intervals_to_refine(angles, responses, threshold, resolution)[:max_poses - len(angles)]
+        if len(split) == 0:
+            break
+
+        new_angles = (angles[split] + angles[split + 1]) / 2
+        new_responses = np.asarray(evaluate(new_angles), dtype=float)
+
+        order = np.argsort(np.concatenate((angles, new_angles)), kind="stable")
+        angles = np.concatenate((angles, new_angles))[order]
+        responses = np.concatenate((responses, new_responses))[order]
+
+        refinement_round += 1
+        logging.debug(f"Refinement round {refinement_round}: {len(split)} poses added, {len(angles)} in total")
+
+    logging.info(f"Arc refinement: {len(angles)} poses from {num_coarse} coarse poses in {refinement_round} rounds")
+
+    return angles, responses
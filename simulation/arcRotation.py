@@ -164,6 +164,40 @@ def rotation_rings(sequence_ID, radius, angle_theta, angle_phi):
 
     return all_points, allPositions_polar[:, sequence_ID]
 
+def fibonacci_hemisphere(radius, num_poses, max_polar_deg=90.0):
+    """
+    Near-uniform positions on the upper hemisphere (or a cap of it), from a Fibonacci lattice.
+
+    Point i sits at height z = 1 - (i + 0.5) / N over the cap, so each covers an equal area,
+    and turns by the golden angle in azimuth from the previous point. Unlike the rings of rotation_rings(),
+    which keep the same number of points per ring up to the pole, the spacing is even everywhere.
+
+    Args:
+        radius (float): Radius of the hemisphere.
+        num_poses (int): Number of positions.
+        max_polar_deg (float): Largest angle from the zenith (90 for the whole hemisphere).
+
+    Returns:
+        all_points (np.array): (N,3) cartesian coordinates of each position.
+        polar (np.array): (N,3) [radius, theta (azimuth), phi (from the zenith)] of each position, angles in radians.
+    """
+    golden_angle = np.pi * (3 - np.sqrt(5))
+    lowest = np.cos(np.radians(max_polar_deg))
+
+    indices = np.arange(num_poses)
+    heights = 1 - (indices + 0.5) / num_poses * (1 - lowest)  # cos(phi), equal area steps
+
+    phi = np.arccos(heights)
+    theta = np.mod(indices * golden_angle, 2 * np.pi)
+
+    all_points = np.column_stack(convert_to_cartesian(radius, theta, phi))
+    polar = np.column_stack((np.full(num_poses, radius), theta, phi))
+
+    logging.debug(f"Generated {num_poses} Fibonacci hemisphere points up to {max_polar_deg} degrees from the zenith")
+
+    return all_points, polar
+
+
 def arc_movement_vector(plane_object, coords):
     """
     Gets current position of plane and new position after and calculates the vector between them
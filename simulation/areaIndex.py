@@ -0,0 +1,173 @@
+import numpy as np
+
+# Up to this many areas, testing every point against every area is as fast as the grid lookup
+DENSE_AREA_LIMIT = 8
+# Grid cells per area, more cells give fewer candidate areas per cell
+CELLS_PER_AREA = 4
+# Number of area sets whose index is kept, one per aperture and sensor layout in use
+INDEX_CACHE_SIZE = 8
+
+_index_cache = {}
+
+
+class AreaIndex:
+    """
+    Uniform grid over the bounding box of a set of rectangular areas lying on a plane, listing for each cell
+    the areas overlapping it, so each point is only tested against the few areas of its cell.
+
+    Everything is in the plane's local x/y coordinates. Each area is a rectangle with its own axes,
+    so areas rotated within the plane are supported; the grid uses their bounding boxes.
+    A point on an area's edge (within the tolerance) is inside it.
+    Where areas overlap, the first in the original order wins, as in intersection_checking().
+
+    Attributes:
+    centres (np.array): (A,2) centre of each area.
+    axes (np.array): (A,2,2) each area's right and up axes in plane coordinates.
+    half_sizes (np.array): (A,2) half width and half length of each area, grown by the tolerance.
+    lower, upper (np.array): (2,) corners of the bounding box of all the areas, no point outside it is in any area.
+    candidates (np.array): (cells, K) area indices overlapping each cell in ascending order, padded with -1.
+    """
+
+    def __init__(self, centres, axes, half_sizes, tolerance=0.0):
+        self.centres = np.asarray(centres, dtype=float).reshape(-1, 2)
+        self.axes = np.asarray(axes, dtype=float).reshape(-1, 2, 2)
+        self.half_sizes = np.asarray(half_sizes, dtype=float).reshape(-1, 2) + tolerance
+        num_areas = len(self.centres)
+
+        if num_areas == 0:
+            self.lower = np.full(2, np.inf)
+            self.upper = np.full(2, -np.inf)
+            self.origin = np.zeros(2)
+            self.cell_size = np.ones(2)
+            self.shape = np.zeros(2, dtype=int)
+            self.candidates = np.empty((0, 0), dtype=int)
+            return
+
+        # Axis aligned bounding box of each (possibly rotated) rectangle
+        extents = np.abs(self.axes[:, 0]) * self.half_sizes[:, :1] + np.abs(self.axes[:, 1]) * self.half_sizes[:, 1:]
+        lower = self.centres - extents
+        upper = self.centres + extents
+
+        self.lower = lower.min(axis=0)
+        self.upper = upper.max(axis=0)
+
+        self.origin = self.lower
+        extent = np.maximum(self.upper - self.origin, 1e-12)
+
+        # Square-ish cells, about CELLS_PER_AREA of them per area
+        cell_area = extent.prod() / (CELLS_PER_AREA * num_areas)
+        self.shape = np.clip(np.ceil(extent / np.sqrt(cell_area)), 1, None).astype(int)
+        self.cell_size = extent / self.shape
+
+        # Cells touched by each area (edges are inclusive, so an area reaching a cell boundary is listed in both)
+        first = self._cell_coordinates(lower)
+        last = self._cell_coordinates(upper)
+
+        cells = [[] for _ in range(int(self.shape.prod()))]
+        for area_idx in range(num_areas):
+            for j in range(first[area_idx, 1], last[area_idx, 1] + 1):
+                for i in range(first[area_idx, 0], last[area_idx, 0] + 1):
+                    cells[j * self.shape[0] + i].append(area_idx)
+
+        depth = max(1, max(len(cell) for cell in cells))
+        self.candidates = np.full((len(cells), depth), -1, dtype=int)
+        for cell_idx, cell in enumerate(cells):
+            self.candidates[cell_idx, :len(cell)] = cell
+
+    def __len__(self):
+        return len(self.centres)
+
+    def _cell_coordinates(self, points):
+        """
+        (N,2) grid column and row of each point, clipped to the grid.
+        """
+        with np.errstate(invalid="ignore"):
+            cell = np.floor((points - self.origin) / self.cell_size)
+        return np.clip(np.nan_to_num(cell, nan=0), 0, self.shape - 1).astype(int)
+
+    def _inside(self, points, candidates):
+        """
+        (N,K) test of each point against its candidate areas, in each area's own frame.
+        """
+        offsets = points[:, None, :] - self.centres[candidates]  # (N,K,2)
+        axes = self.axes[candidates]  # (N,K,2,2)
+        half_sizes = self.half_sizes[candidates]
+
+        # NaN coordinates compare False
+        return ((np.abs(np.sum(offsets * axes[..., 0, :], axis=2)) <= half_sizes[..., 0]) &
+                (np.abs(np.sum(offsets * axes[..., 1, :], axis=2)) <= half_sizes[..., 1]))
+
+    def in_bounds(self, points):
+        """
+        (N,) True for points inside the bounding box of all the areas, the only points that can be in one.
+        """
+        # NaN coordinates compare False
+        return np.all((points >= self.lower) & (points <= self.upper), axis=1)
+
+    def bounds_overlap(self, lower, upper):
+        """
+        (P,) True for the boxes, given by (P,2) lower and upper corners, overlapping the bounding box of the areas.
+        """
+        return np.all((lower <= self.upper) & (upper >= self.lower), axis=1)
+
+    def locate(self, points):
+        """
+        Finds which area, if any, contains each point.
+
+        Args:
+            points (np.array): (N,2) plane x/y coordinates, NaN for points to reject.
+
+        Returns:
+            np.array: (N,) index of the containing area, -1 where no area contains the point.
+        """
+        points = np.asarray(points, dtype=float)
+        if len(self) == 0:
+            return np.full(len(points), -1)
+
+        if len(self) <= DENSE_AREA_LIMIT:
+            inside = self._inside(points, np.arange(len(self))[None, :])
+            return np.where(inside.any(axis=1), inside.argmax(axis=1), -1)
+
+        cell = self._cell_coordinates(points)
+        candidates = self.candidates[cell[:, 1] * self.shape[0] + cell[:, 0]]  # (N, K)
+
+        # Padding entries index the last area, and are masked out
+        inside = self._inside(points, candidates) & (candidates >= 0)
+
+        # Candidates are in ascending order, so the first match is the first area in the original order
+        first = inside.argmax(axis=1)
+        return np.where(inside.any(axis=1), candidates[np.arange(len(points)), first], -1)
+
+
+def area_geometry(plane, areas):
+    """
+    Centres, axes and half sizes of areas in the plane's local x/y coordinates.
+    """
+    if len(areas) == 0:
+        return np.empty((0, 2)), np.empty((0, 2, 2)), np.empty((0, 2))
+
+    basis = np.vstack((plane.right, plane.up)).T  # (3,2) projection onto the plane axes
+
+    centres = (np.array([area.position for area in areas], dtype=float) - plane.position) @ basis
+    axes = np.array([[area.right, area.up] for area in areas], dtype=float) @ basis
+    half_sizes = np.array([[area.width / 2, area.length / 2] for area in areas], dtype=float)
+
+    return centres, axes, half_sizes
+
+
+def area_index(plane, areas, tolerance=0.0):
+    """
+    AreaIndex of a list of Areas on a plane, built once per distinct geometry and then reused.
+    """
+    geometry = area_geometry(plane, areas)
+
+    key = b"".join(np.ascontiguousarray(array).tobytes() for array in geometry) + np.float64(tolerance).tobytes()
+    index = _index_cache.get(key)
+
+    if index is None:
+        if len(_index_cache) >= INDEX_CACHE_SIZE:
+            _index_cache.pop(next(iter(_index_cache)))
+        index = AreaIndex(*geometry, tolerance)
+        _index_cache[key] = index
+
+    return index
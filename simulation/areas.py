@@ -41,12 +41,40 @@ class Areas:
         ])
 
 
+    def local_coordinates(self, points):
+        """
+        Projects points onto the area's right and up axes, relative to its centre.
+
+        Args:
+            points (np.array): (3,) point or (N,3) points.
+
+        Returns:
+            Coordinates along right and along up, scalars or (N,) arrays.
+        """
+        offsets = np.asarray(points, dtype=float) - self.position
+        return offsets @ self.right, offsets @ self.up
+
+    def contains(self, points, tolerance=0.0):
+        """
+        Checks whether points lie within the area's rectangle, in its own frame, so any orientation is supported.
+        Points are assumed to lie on the area's plane (e.g. intersections with the plane containing it).
+
+        Args:
+            points (np.array): (3,) point or (N,3) points, NaN coordinates are never contained.
+            tolerance (float): Distance the rectangle is grown by on every edge.
+
+        Returns:
+            Boolean, or (N,) boolean array.
+        """
+        u, v = self.local_coordinates(points)
+        return (np.abs(u) <= self.width / 2 + tolerance) & (np.abs(v) <= self.length / 2 + tolerance)
+
     ## Checking for intersection between area and intersection (with sensor plane) coordinates
-    def record_result(self, cords):
-        # True, if intersection x coordinate is within area boundary (x min and x max)
-        if (self.position[0] - (self.width / 2) <= cords[0] <= self.position[0] + (self.width / 2)
-                and  # True, if intersection y coordinate is within area boundary (y min and y max)
-                self.position[1] - (self.length / 2) <= cords[1] <= self.position[1] + (self.length / 2)):
+    def record_result(self, cords, tolerance=0.0):
+        # True, if the intersection is within the area boundary (grown by the tolerance) along its right and up axes
+        if cords is None:  # Rejected intersection
+            return 0
+        if self.contains(cords, tolerance):
             return 1
         else:
             return 0
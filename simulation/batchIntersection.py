@@ -0,0 +1,332 @@
+from collections import Counter
+
+import numpy as np
+
+from areaIndex import area_index
+from intersectionCalculations import intersection_parameters, intersection_settings
+
+# Rays and poses reaching the aperture stage since the last reset_cull_statistics(), and how many of them were
+# culled against the bounding box of the apertures before any per-aperture test:
+# "rays", "culled rays", "poses" and "culled poses" (poses are only counted where whole poses are culled)
+cull_statistics = Counter()
+
+
+def reset_cull_statistics():
+    cull_statistics.clear()
+
+
+def cull_ratio():
+    """
+    Fraction of the rays culled since the last reset, None if no rays were traced.
+    """
+    if not cull_statistics["rays"]:
+        return None
+
+    return cull_statistics["culled rays"] / cull_statistics["rays"]
+
+
+def cull_summary():
+    """
+    One line description of the culling since the last reset, empty if no rays were traced.
+    """
+    if not cull_statistics["rays"]:
+        return ""
+
+    summary = (f"{cull_ratio():.1%} of "
+               f"{cull_statistics['rays']} rays culled against the aperture bounds")
+    if cull_statistics["poses"]:
+        summary += f", {cull_statistics['culled poses']} of {cull_statistics['poses']} poses culled whole"
+
+    return summary
+
+
+def plane_intersections(plane, origins, directions):
+    """
+    Calculates the intersection of every ray in a batch with a plane.
+    Batched equivalent of intersection_wrapper(), applying the configured intersection limits.
+
+    Args:
+        plane (Plane): Plane to intersect with.
+        origins (np.array): (N,3) ray start positions.
+        directions (np.array): (N,3) ray directions.
+
+    Returns:
+        np.array: (N,3) intersection coordinates, NaN for rejected rays (parallel to the plane,
+            or in strict mode behind the origin or beyond max_distance).
+    """
+    t = intersection_parameters(plane, origins, directions)
+
+    return directions * t[:, None] + origins
+
+
+def plane_coordinates(plane, points):
+    """
+    Projects points onto a plane's local right/up axes.
+
+    Returns:
+        x (np.array): (N,) coordinate along plane.right.
+        y (np.array): (N,) coordinate along plane.up.
+    """
+    offsets = points - plane.position
+
+    return offsets @ plane.right, offsets @ plane.up
+
+
+def batch_containment(plane, areas, coordinates, tolerance=None):
+    """
+    Finds which area, if any, contains each intersection point.
+    Batched equivalent of intersection_checking(), the first matching area wins.
+    Points are tested in each area's own right/up frame, so any plane and area orientation is handled.
+    Uses a grid index of the areas (see areaIndex.py), built on first use and reused while the areas are unchanged.
+
+    Args:
+        plane (Plane): The plane the areas lie on, the points are intersections with it.
+        areas (list): List of Areas objects.
+        coordinates (np.array): (N,3) intersection coordinates.
+        tolerance (float): Distance outside an area's edges still counted as inside,
+            defaults to the configured intersection tolerance.
+
+    Returns:
+        np.array: (N,) index of the containing area in `areas`, -1 where no area contains the point.
+    """
+    if tolerance is None:
+        tolerance = intersection_settings["tolerance"]
+
+    # NaN coordinates (rejected rays) are never contained
+    x, y = plane_coordinates(plane, coordinates)
+    return area_index(plane, areas, tolerance).locate(np.column_stack((x, y)))
+
+
+def filter_rays(surfaces, origins, directions):
+    """
+    Traces rays through an ordered stack of surfaces (see surfacePipeline.py), compacting the live rays after each
+    surface so later surfaces only intersect the rays still travelling.
+
+    A ray passes a "pass" surface through one of its areas, and a "block" surface anywhere outside its areas
+    (including rays that never reach its plane).
+
+    Args:
+        surfaces (list): Surface objects, in the order rays cross them.
+        origins (np.array): (N,3) ray start positions.
+        directions (np.array): (N,3) ray directions.
+
+    Returns:
+        live (np.array): (N,) True for rays passing every surface.
+        intersection_coordinates (np.array): (N,3) intersection with the surface that stopped each ray,
+            NaN for live rays.
+    """
+    live = np.arange(len(origins))
+    intersection_coordinates = np.full((len(origins), 3), np.nan)
+
+    for surface in surfaces:
+        if len(live) == 0:
+            break
+
+        coordinates = plane_intersections(surface.plane, origins[live], directions[live])
+        inside = batch_containment(surface.plane, surface.areas, coordinates) >= 0
+        passed = ~inside if surface.blocking else inside
+
+        intersection_coordinates[live[~passed]] = coordinates[~passed]
+        live = live[passed]
+
+    mask = np.zeros(len(origins), dtype=bool)
+    mask[live] = True
+
+    return mask, intersection_coordinates
+
+
+def aperture_containment(aperturePlane, apertureAreas, coordinates):
+    """
+    Finds which aperture, if any, each ray passes through, as batch_containment(), first discarding the rays
+    outside the bounding box of all the apertures so only the rest are tested against each aperture.
+
+    Returns:
+        np.array: (N,) index of the aperture each ray passes through, -1 where none.
+    """
+    x, y = plane_coordinates(aperturePlane, coordinates)
+    points = np.column_stack((x, y))
+    index = area_index(aperturePlane, apertureAreas, intersection_settings["tolerance"])
+
+    candidates = np.flatnonzero(index.in_bounds(points))
+    cull_statistics["rays"] += len(points)
+    cull_statistics["culled rays"] += len(points) - len(candidates)
+
+    aperture_index = np.full(len(points), -1)
+    if len(candidates) > 0:
+        aperture_index[candidates] = index.locate(points[candidates])
+
+    return aperture_index
+
+
+def cull_poses(aperturePlane, apertureAreas, corners, directions, num_rays):
+    """
+    Finds the poses whose rays cannot reach any aperture, so they can be skipped without tracing.
+
+    The rays of a pose are parallel and start within the box given by its corners, so their intersections with
+    the aperture plane lie within the box of the corners' intersections. A pose is culled when that box misses
+    the bounding box of the apertures, or when every ray is rejected (parallel to the plane, or in strict mode
+    all behind the origin or beyond max_distance). Poses with only some rays rejected are traced as usual,
+    so the rejected ray counts are the same whether or not poses are culled.
+
+    Args:
+        corners (np.array): (P,K,3) points whose bounding box holds every ray origin of each pose.
+        directions (np.array): (P,3) ray direction at each pose.
+        num_rays (int): Rays per pose, for the statistics.
+
+    Returns:
+        culled (np.array): (P,) True for poses to skip.
+        rejection (list): For each culled pose whose rays are all rejected, the rejected_rays reason, else None.
+    """
+    index = area_index(aperturePlane, apertureAreas, intersection_settings["tolerance"])
+
+    nU = directions @ aperturePlane.direction
+    nA = corners @ aperturePlane.direction
+    nP = np.dot(aperturePlane.direction, aperturePlane.position)
+
+    parallel = nU == 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = (nP - nA) / np.where(parallel, 1, nU)[:, None]  # (P,K), extremes of each pose's rays
+
+    behind = np.zeros(len(corners), dtype=bool)
+    beyond = np.zeros(len(corners), dtype=bool)
+    valid = ~parallel
+    if intersection_settings["strict_mode"]:
+        distance = t * np.linalg.norm(directions, axis=1)[:, None]
+        behind = ~parallel & (t.max(axis=1) < 0)
+        beyond = ~parallel & ~behind & (distance.min(axis=1) > intersection_settings["max_distance"])
+        valid &= (t.min(axis=1) >= 0) & (distance.max(axis=1) <= intersection_settings["max_distance"])
+
+    x, y = plane_coordinates(aperturePlane, corners + t[..., None] * directions[:, None, :])
+    footprint = np.stack((x, y), axis=2)
+    missed = valid & ~index.bounds_overlap(footprint.min(axis=1), footprint.max(axis=1))
+
+    culled = parallel | behind | beyond | missed
+    rejection = [None if not culled[idx] or missed[idx] else
+                 "parallel" if parallel[idx] else "behind" if behind[idx] else "beyond" for idx in range(len(culled))]
+
+    num_culled = int(np.count_nonzero(culled))
+    cull_statistics["poses"] += len(culled)
+    cull_statistics["culled poses"] += num_culled
+    cull_statistics["rays"] += num_culled * num_rays
+    cull_statistics["culled rays"] += num_culled * num_rays
+
+    return culled, rejection
+
+
+def trace_rays(sensorPlane, sensorAreas, aperturePlane, apertureAreas, origins, directions, surfaces=()):
+    """
+    Traces a batch of rays through the aperture plane, then any further surfaces, to the sensor plane.
+
+    Each stage only intersects the rays that passed the previous ones,
+    and rays outside the bounding box of the apertures are culled before the per-aperture tests.
+
+    Args:
+        surfaces (list): Optional Surface objects crossed between the aperture plane and the sensor plane.
+
+    Returns:
+        aperture_index (np.array): (N,) aperture each ray passed through, -1 if blocked
+            at the aperture plane or a later surface.
+        sensor_index (np.array): (N,) sensor each ray hit, -1 if none.
+        intersection_coordinates (np.array): (N,3) final intersection of each ray,
+            the sensor plane if it passed every surface, otherwise the surface that stopped it.
+    """
+    intersection_coordinates = plane_intersections(aperturePlane, origins, directions)
+    aperture_index = aperture_containment(aperturePlane, apertureAreas, intersection_coordinates)
+
+    passed = np.flatnonzero(aperture_index >= 0)
+
+    if len(surfaces) > 0:
+        live, surface_coordinates = filter_rays(surfaces, origins[passed], directions[passed])
+        blocked = passed[~live]
+
+        aperture_index[blocked] = -1
+        intersection_coordinates[blocked] = surface_coordinates[~live]
+        passed = passed[live]
+
+    sensor_index = np.full(len(origins), -1)
+
+    sensor_coordinates = plane_intersections(sensorPlane, origins[passed], directions[passed])
+    sensor_index[passed] = batch_containment(sensorPlane, sensorAreas, sensor_coordinates)
+    intersection_coordinates[passed] = sensor_coordinates
+
+    return aperture_index, sensor_index, intersection_coordinates
+
+
+def classify_rays(sensorAreas, aperture_index, sensor_index):
+    """
+    Classifies traced rays as hits or misses and updates the illumination of each sensor area.
+
+    Returns:
+        hits (np.array): (N,) True for rays hitting a sensor.
+        misses (np.array): (N,) True for rays counted as misses.
+    """
+    hits = sensor_index >= 0
+    # Rays passing an aperture are only counted as misses when there are sensors to miss (as in the Line loop)
+    misses = (aperture_index < 0) | (~hits & (len(sensorAreas) > 0))
+
+    illumination = np.bincount(sensor_index[hits], minlength=len(sensorAreas))
+    for sensor, count in zip(sensorAreas, illumination):
+        sensor.illumination = int(count)
+
+    return hits, misses
+
+
+def evaluate_ray_batch(sensorPlane, sensorAreas, aperturePlane, apertureAreas, origins, directions, surfaces=()):
+    """
+    Vectorised counterpart of evaluate_line_results(), evaluating every ray of a pose at once.
+
+    Updates the illumination of each sensor area.
+
+    Args:
+        sensorPlane: The plane containing the sensors.
+        sensorAreas: List of all sensor objects - target areas to evaluate hits.
+        aperturePlane: The plane containing the apertures.
+        apertureAreas: List of all aperture objects.
+        origins (np.array): (N,3) ray start positions.
+        directions (np.array): (N,3) ray directions.
+        surfaces (list): Optional Surface objects between the aperture plane and the sensor plane.
+
+    Returns:
+        hit: number of hits.
+        miss: number of misses.
+        hit_list: line ids of hits.
+        miss_list: line ids of misses.
+        results (np.array): (N,) 1 for a hit, otherwise 0.
+        intersection_coordinates (np.array): (N,3) final intersection of each ray.
+    """
+    aperture_index, sensor_index, intersection_coordinates = trace_rays(
+        sensorPlane, sensorAreas, aperturePlane, apertureAreas, origins, directions, surfaces)
+
+    hits, misses = classify_rays(sensorAreas, aperture_index, sensor_index)
+
+    hit_list = np.flatnonzero(hits).tolist()
+    miss_list = np.flatnonzero(misses).tolist()
+
+    return len(hit_list), len(miss_list), hit_list, miss_list, hits.astype(int), intersection_coordinates
+
+
+def evaluate_ray_bundle(sensorPlane, sensorAreas, aperturePlane, apertureAreas, rays, surfaces=()):
+    """
+    Evaluates a RayBundle at its current pose, storing each ray's result, intersection
+    and the aperture and sensor it passed through in the bundle.
+
+    Returns:
+        hit: number of hits.
+        miss: number of misses.
+        hit_list: line ids of hits.
+        miss_list: line ids of misses.
+    """
+    aperture_index, sensor_index, intersection_coordinates = trace_rays(
+        sensorPlane, sensorAreas, aperturePlane, apertureAreas, rays.positions, rays.directions, surfaces)
+
+    hits, misses = classify_rays(sensorAreas, aperture_index, sensor_index)
+
+    rays.results[:] = hits
+    rays.intersection_coordinates[:] = intersection_coordinates
+    rays.aperture_index[:] = aperture_index
+    rays.sensor_index[:] = sensor_index
+
+    hit_list = np.flatnonzero(hits).tolist()
+    miss_list = np.flatnonzero(misses).tolist()
+
+    return len(hit_list), len(miss_list), hit_list, miss_list
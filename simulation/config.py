@@ -25,8 +25,25 @@ class Config:
         self.debugging = data["debugging"]
         self.performance = data["performance"]
         self.output = data["output"]
+        # Optional stack of surfaces between the aperture and sensor planes (see surfacePipeline.py)
+        self.surfaces = data.get("surfaces", [])
 
         log_level = self.debugging.get("logging_level", "INFO").upper()
         logging.basicConfig(level=getattr(logging, log_level, logging.INFO))
 
+    def to_dict(self):
+        return {
+            "planes": self.planes,
+            "sensor_areas": self.sensor_areas,
+            "aperture_areas": self.aperture_areas,
+            "arc_movement": self.arc_movement,
+            "simulation": self.simulation,
+            "intersection": self.intersection,
+            "visualization": self.visualization,
+            "debugging": self.debugging,
+            "performance": self.performance,
+            "output": self.output,
+            "surfaces": self.surfaces,
+        }
+
 config = Config(file_path="../config.json")
\ No newline at end of file
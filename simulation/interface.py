@@ -8,8 +8,10 @@ from ttkbootstrap.constants import *
 
 import json
 import ast
+import threading
 from config import Config
 from main import run_all_test
+from layoutOptimiser import latest_heatmap, optimise_config_layout
 
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from matplotlib.figure import Figure
@@ -233,6 +235,10 @@ def config_gui():
                 except (ValueError, SyntaxError):
                     new_config[section][key] = text
 
+        # Sections without entry fields (e.g. the list of surfaces) are kept as loaded
+        for section, section_data in original_config.items():
+            new_config.setdefault(section, section_data)
+
         temp_config = Config(data=new_config)
 
         messagebox.showinfo("Applied", "Configuration loaded into memory.")
@@ -322,6 +328,54 @@ def config_gui():
         update_plot(plot_area, sensor_positions)
 
 
+    # Optimise the layout from the sensor plane heatmap of the latest run
+    def plot_optimised_layout_and_update_config():
+        heatmap_path = latest_heatmap()
+        if heatmap_path is None:
+            messagebox.showwarning("No Heatmap", "Run the simulation with heatmap output enabled first.")
+            return
+
+        # The optimisation takes a while, run it off the event thread so the window keeps responding
+        outcome = {}
+
+        def optimise():
+            try:
+                outcome["layout"] = optimise_config_layout(config_obj, heatmap_path)
+            except Exception as error:
+                outcome["error"] = error
+
+        worker = threading.Thread(target=optimise, daemon=True)
+        optimise_button.configure(state="disabled")
+        root.configure(cursor="watch")
+        worker.start()
+        root.after(100, show_optimised_layout, worker, outcome)
+
+    def show_optimised_layout(worker, outcome):
+        # Tk widgets are only touched from the event thread, which polls until the optimisation finishes
+        if worker.is_alive():
+            root.after(100, show_optimised_layout, worker, outcome)
+            return
+
+        optimise_button.configure(state="normal")
+        root.configure(cursor="")
+        if "error" in outcome:
+            messagebox.showerror("Optimisation Failed", str(outcome["error"]))
+            return
+
+        layout = outcome["layout"]
+        result = layout.pop("result")
+
+        for key, area in layout.items():
+            config_obj.sensor_areas[key].update(area)
+            # Show the new layout in the sensor entries, so it is used by Apply and Run
+            entry = entry_widgets[("sensor_areas", key)]
+            entry.delete(0, tk.END)
+            entry.insert(0, str(config_obj.sensor_areas[key]))
+
+        update_plot(plot_area, [tuple(area["position"][:2]) for area in layout.values()])
+        messagebox.showinfo("Layout Optimised", f"Discrimination score {result['score']:.2f} "
+                                                f"(grid search {result['grid_score']:.2f})")
+
     def update_plot(frame, sensor_positions):
         for widget in frame.winfo_children():
             widget.destroy()
@@ -383,6 +437,8 @@ def config_gui():
 
     ttk.Button(btn_frame, text="📂 Load Existing Layout", command=plot_existing_config_layout, bootstyle="light").pack(side="left", padx=5)
     ttk.Button(btn_frame, text="🧮 Calculate Layout", command=plot_simulated_layout_and_update_config, bootstyle="light").pack(side="left", padx=5)
+    optimise_button = ttk.Button(btn_frame, text="🎯 Optimise Layout", command=plot_optimised_layout_and_update_config, bootstyle="light")
+    optimise_button.pack(side="left", padx=5)
 
 
     for key in config_obj.sensor_areas:
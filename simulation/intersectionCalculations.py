@@ -1,7 +1,76 @@
+from collections import Counter
+
 from line import Line
 from plane import Plane
 import numpy as np
 
+# Limits applied to every intersection, set from config.intersection by configure_intersections().
+# The defaults accept any intersection along the ray's line, as before the settings were honoured.
+intersection_settings = {"max_distance": np.inf, "strict_mode": False, "tolerance": 0.0}
+
+# Rays rejected since the last reset_rejected_rays(), by reason:
+# "parallel" to the plane, "behind" the ray origin, or "beyond" max_distance
+rejected_rays = Counter()
+
+
+def configure_intersections(settings):
+    """
+    Sets the intersection limits from the intersection section of the config.
+
+    Args:
+        settings (dict): max_distance, strict_mode and tolerance.
+            In strict mode, intersections behind the ray origin or further than max_distance along it are rejected.
+            tolerance is the distance outside an area's edges still counted as inside it.
+    """
+    intersection_settings.update({key: settings[key] for key in intersection_settings if key in settings})
+
+
+def reset_rejected_rays():
+    rejected_rays.clear()
+
+
+def intersection_parameters(plane, origins, directions):
+    """
+    Batched intersection kernel, the ray parameter t of each ray's intersection with a plane
+    (intersection = origin + t * direction), applying the configured limits.
+
+    Rejected rays are counted in rejected_rays rather than reported one by one.
+
+    Args:
+        plane (Plane): Plane to intersect with.
+        origins (np.array): (N,3) ray start positions.
+        directions (np.array): (N,3) ray directions.
+
+    Returns:
+        np.array: (N,) ray parameters, NaN for rejected rays.
+    """
+    nU = np.sum(directions * plane.direction, axis=1)
+    nA = np.sum(origins * plane.direction, axis=1)
+    nP = np.dot(plane.direction, plane.position)
+
+    parallel = nU == 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = np.where(parallel, np.nan, (nP - nA) / nU)
+    rejected_rays["parallel"] += int(np.count_nonzero(parallel))
+
+    if intersection_settings["strict_mode"]:
+        with np.errstate(invalid="ignore"):
+            behind = t < 0
+            beyond = t * np.linalg.norm(directions, axis=1) > intersection_settings["max_distance"]
+
+        rejected_rays["behind"] += int(np.count_nonzero(behind))
+        rejected_rays["beyond"] += int(np.count_nonzero(beyond))
+        t[behind | beyond] = np.nan
+
+    return t
+
+
+def rejection_summary():
+    """
+    One line description of the rays rejected since the last reset, empty if none were.
+    """
+    return ", ".join(f"{count} {reason}" for reason, count in sorted(rejected_rays.items()) if count)
+
 def direction_vectors(array1, array2):
     check_direction = np.multiply(array1, array2)
     check_direction = np.sum(check_direction)
@@ -23,23 +92,27 @@ def calculate_intersection(line, t):
     return coordinates
 
 def intersection_wrapper(sensorPlane, line1):
+    """
+    Intersection of a single line with a plane, None if it is rejected (see intersection_parameters()).
+    """
     nU = direction_vectors(sensorPlane.direction, line1.direction)
 
-    if nU != 0:
-        nA = np.dot(sensorPlane.direction, line1.position)
-        nP = np.dot(sensorPlane.direction, sensorPlane.position)
+    if nU == 0:
+        rejected_rays["parallel"] += 1
+        return None
 
-        # print(f"nA  = {nA}")
-        # print(f"nP  = {nP}")
-        # print(f"nU  = {nU}")
+    nA = np.dot(sensorPlane.direction, line1.position)
+    nP = np.dot(sensorPlane.direction, sensorPlane.position)
 
-        x = compute_t(nP, nA, nU)
-        IntersectionCoordinates = calculate_intersection(line1, x)
+    x = compute_t(nP, nA, nU)
 
-        return IntersectionCoordinates
-    else:
-        # print(nU)
-        print(f"🚨 intersection not possible for nU vector: {nU}")
-        # exit(1)
-        return None
+    if intersection_settings["strict_mode"]:
+        if x < 0:
+            rejected_rays["behind"] += 1
+            return None
+        if x * np.linalg.norm(line1.direction) > intersection_settings["max_distance"]:
+            rejected_rays["beyond"] += 1
+            return None
+
+    return calculate_intersection(line1, x)
 
@@ -0,0 +1,271 @@
+"""
+Sensor layout optimisation from a saved sensor plane heatmap (see sensorHeatmap.py).
+
+Each candidate layout is scored by summing the heatmap cells under each sensor at every pose,
+using summed-area tables, so no rays are retraced. Layouts are searched by a greedy grid search,
+placing one sensor at a time, refined by Nelder-Mead over all sensor positions (and optionally sizes).
+
+Run from the simulation directory:
+    python layoutOptimiser.py --heatmap ../data/heatmap_0.npz
+"""
+import argparse
+import glob
+import logging
+import os
+
+import numpy as np
+from scipy.optimize import minimize
+
+from sensorHeatmap import load_heatmap
+
+# Added to the response of both poses when comparing them, avoids dividing by zero where no rays land
+RESPONSE_EPSILON = 1e-9
+# Score penalty per unit area of overlap between sensors, or of sensor area outside the plane
+OVERLAP_PENALTY = 1e3
+
+
+class IrradianceMap:
+    """
+    Per-pose fraction of the source's rays landing on each cell of the sensor plane, with summed-area tables
+    so the response of any axis-aligned rectangle at every pose costs four lookups.
+
+    Rectangles are given in global x/y, as the sensor areas in the config, and snapped to the grid.
+    """
+
+    def __init__(self, heatmap):
+        """
+    Args:
+        heatmap (dict): As returned by load_heatmap().
+    """
+        counts = heatmap["counts"].astype(float) / float(heatmap["ray_count"])
+        self.num_poses = len(counts)
+
+        # (P, ny+1, nx+1) table, entry [p, j, i] is the sum of cells [p, :j, :i]
+        self.table = np.zeros((self.num_poses, counts.shape[1] + 1, counts.shape[2] + 1))
+        self.table[:, 1:, 1:] = counts.cumsum(axis=1).cumsum(axis=2)
+
+        self.x_edges = heatmap["x_edges"]
+        self.y_edges = heatmap["y_edges"]
+        self.position = heatmap["plane_position"]
+        self.right = heatmap["plane_right"]
+        self.up = heatmap["plane_up"]
+
+        # Global x/y extent of the plane, for bounding the search
+        corners = np.array([self.position + x * self.right + y * self.up
+                            for x in self.x_edges[[0, -1]] for y in self.y_edges[[0, -1]]])
+        self.lower = corners[:, :2].min(axis=0)
+        self.upper = corners[:, :2].max(axis=0)
+
+    @staticmethod
+    def _snap(values, edges):
+        """
+        Index of the nearest cell edge to each value, within the grid.
+        """
+        step = edges[1] - edges[0]
+        return np.clip(np.rint((values - edges[0]) / step), 0, len(edges) - 1).astype(int)
+
+    def to_local(self, points):
+        """
+        Converts (N,2) global x/y points on the plane to its local x/y coordinates.
+        """
+        offsets = np.column_stack((points, np.full(len(points), self.position[2]))) - self.position
+        return np.column_stack((offsets @ self.right, offsets @ self.up))
+
+    def sensor_response(self, centres, sizes):
+        """
+        Fraction of the source's rays landing on each sensor at each pose.
+
+        Args:
+            centres (np.array): (S,2) global x/y centre of each sensor.
+            sizes (np.array): (S,2) width (x) and length (y) of each sensor.
+
+        Returns:
+            np.array: (P,S) response of each sensor at each pose.
+        """
+        centres = np.asarray(centres, dtype=float)
+        half = np.asarray(sizes, dtype=float) / 2
+
+        # Opposite corners in local coordinates, the local axes may be flipped relative to the global ones
+        first = self.to_local(centres - half)
+        second = self.to_local(centres + half)
+        lower = np.minimum(first, second)
+        upper = np.maximum(first, second)
+
+        i0, i1 = (self._snap(bound[:, 0], self.x_edges) for bound in (lower, upper))
+        j0, j1 = (self._snap(bound[:, 1], self.y_edges) for bound in (lower, upper))
+
+        table = self.table
+        return table[:, j1, i1] - table[:, j0, i1] - table[:, j1, i0] + table[:, j0, i0]
+
+
+def discrimination(response, num_lines):
+    """
+    How well consecutive poses can be told apart from the sensor readings.
+
+    For each pair of consecutive poses, the squared change of each sensor's expected count is divided by its
+    Poisson variance, and summed over sensors. The score is the mean over pose pairs.
+
+    Args:
+        response (np.array): (P,S) fraction of the rays landing on each sensor at each pose.
+        num_lines (int): Rays fired per pose, scales the counts and their noise.
+    """
+    counts = response * num_lines
+    change = np.diff(counts, axis=0)
+    variance = counts[1:] + counts[:-1] + RESPONSE_EPSILON
+
+    return float(np.mean(np.sum(change ** 2 / variance, axis=1)))
+
+
+def layout_penalty(irradiance_map, centres, sizes):
+    """
+    Area of overlap between sensors plus the area of sensors outside the plane.
+    """
+    lower = centres - sizes / 2
+    upper = centres + sizes / 2
+
+    overlap = np.clip(np.minimum(upper[:, None], upper[None]) - np.maximum(lower[:, None], lower[None]), 0, None)
+    overlap_area = np.triu(overlap.prod(axis=2), k=1).sum()
+
+    outside = (np.clip(irradiance_map.lower - lower, 0, None) + np.clip(upper - irradiance_map.upper, 0, None))
+    outside_area = (outside * sizes[:, ::-1]).sum()
+
+    return overlap_area + outside_area
+
+
+def layout_score(irradiance_map, centres, sizes, num_lines):
+    return (discrimination(irradiance_map.sensor_response(centres, sizes), num_lines) -
+            OVERLAP_PENALTY * layout_penalty(irradiance_map, centres, sizes))
+
+
+def grid_search(irradiance_map, sizes, num_lines, grid_step):
+    """
+    Places the sensors one at a time, each at the grid position that maximises the score of the sensors placed so far.
+
+    Returns:
+        np.array: (S,2) sensor centres.
+    """
+    centres = np.zeros((0, 2))
+
+    for sensor_idx, size in enumerate(sizes):
+        half = size / 2
+        xs = np.arange(irradiance_map.lower[0] + half[0], irradiance_map.upper[0] - half[0] + 1e-9, grid_step)
+        ys = np.arange(irradiance_map.lower[1] + half[1], irradiance_map.upper[1] - half[1] + 1e-9, grid_step)
+
+        best_score, best_centre = -np.inf, None
+        for x in xs:
+            for y in ys:
+                candidate = np.vstack((centres, [x, y]))
+                score = layout_score(irradiance_map, candidate, sizes[:sensor_idx + 1], num_lines)
+                if score > best_score:
+                    best_score, best_centre = score, (x, y)
+
+        centres = np.vstack((centres, best_centre))
+        logging.debug(f"Sensor {sensor_idx} placed at {best_centre}, score {best_score:.3f}")
+
+    return centres
+
+
+def optimise_layout(irradiance_map, sizes, num_lines, grid_step=0.5, optimise_sizes=False, size_bounds=(0.5, 3.0),
+                    max_iterations=2000):
+    """
+    Searches sensor positions (and optionally sizes) that maximise the discrimination between poses.
+
+    Args:
+        irradiance_map (IrradianceMap): Map of the sweep to design for.
+        sizes (np.array): (S,2) width and length of each sensor, the starting sizes if optimise_sizes is set.
+        num_lines (int): Rays fired per pose in the deployed simulation.
+        grid_step (float): Spacing of the grid search.
+        optimise_sizes (bool): Also refine the sensor sizes.
+        size_bounds (tuple): Smallest and largest sensor side when sizes are refined.
+        max_iterations (int): Nelder-Mead iteration limit.
+
+    Returns:
+        dict: centres (S,2), sizes (S,2), score, and the grid search score before refinement.
+    """
+    sizes = np.asarray(sizes, dtype=float)
+    num_sensors = len(sizes)
+
+    grid_centres = grid_search(irradiance_map, sizes, num_lines, grid_step)
+    grid_score = layout_score(irradiance_map, grid_centres, sizes, num_lines)
+
+    def unpack(params):
+        layout_centres = params[:2 * num_sensors].reshape(num_sensors, 2)
+        if optimise_sizes:
+            return layout_centres, np.clip(params[2 * num_sensors:].reshape(num_sensors, 2), *size_bounds)
+        return layout_centres, sizes
+
+    def objective(params):
+        return -layout_score(irradiance_map, *unpack(params), num_lines)
+
+    start = np.concatenate((grid_centres.ravel(), sizes.ravel())) if optimise_sizes else grid_centres.ravel()
+    result = minimize(objective, start, method="Nelder-Mead",
+                      options={"maxiter": max_iterations, "xatol": 1e-3, "fatol": 1e-6, "adaptive": True})
+
+    centres, refined_sizes = unpack(result.x)
+    score = -result.fun
+    if score < grid_score:  # Keep the grid layout if the refinement did not improve on it
+        centres, refined_sizes, score = grid_centres, sizes, grid_score
+
+    logging.info(f"Layout score {grid_score:.3f} after grid search, {score:.3f} after refinement")
+    return {"centres": centres, "sizes": refined_sizes, "score": score, "grid_score": grid_score}
+
+
+def latest_heatmap(data_dir="../data"):
+    """
+    Path of the heatmap of the most recent simulation in data_dir, None if there is none.
+    """
+    paths = glob.glob(os.path.join(data_dir, "heatmap_*.npz"))
+    if not paths:
+        return None
+
+    return max(paths, key=lambda path: int(os.path.basename(path)[len("heatmap_"):-len(".npz")]))
+
+
+def optimise_config_layout(config, heatmap_path, **kwargs):
+    """
+    Optimises the positions of the sensors defined in the config, keeping their sizes unless optimise_sizes is set.
+
+    Returns:
+        dict: {sensor key: {"position": [x, y, z], "width": w, "length": l}} for each sensor, and the result of
+            optimise_layout() under "result".
+    """
+    keys = list(config.sensor_areas.keys())
+    sizes = np.array([[config.sensor_areas[key]["width"], config.sensor_areas[key]["length"]] for key in keys])
+
+    heatmap = load_heatmap(heatmap_path)
+    irradiance_map = IrradianceMap(heatmap)
+    current = np.array([config.sensor_areas[key]["position"][:2] for key in keys], dtype=float)
+    logging.info(f"Current layout score "
+                 f"{layout_score(irradiance_map, current, sizes, config.simulation['num_lines']):.3f}")
+
+    result = optimise_layout(irradiance_map, sizes, config.simulation["num_lines"], **kwargs)
+
+    layout = {}
+    for key, centre, size in zip(keys, result["centres"], result["sizes"]):
+        z = config.sensor_areas[key]["position"][2]
+        layout[key] = {"position": [float(centre[0]), float(centre[1]), z],
+                       "width": float(size[0]), "length": float(size[1])}
+    layout["result"] = result
+
+    return layout
+
+
+if __name__ == "__main__":
+    from config import Config
+
+    parser = argparse.ArgumentParser(description="Optimise the sensor layout from a sensor plane heatmap")
+    parser.add_argument("--config", default="../config.json", help="Path to the JSON config file")
+    parser.add_argument("--heatmap", default=None, help="Heatmap file (default: the latest in ../data)")
+    parser.add_argument("--grid-step", type=float, default=0.5, help="Spacing of the grid search")
+    parser.add_argument("--sizes", action="store_true", help="Also optimise the sensor sizes")
+    args = parser.parse_args()
+
+    heatmap_file = args.heatmap or latest_heatmap()
+    if heatmap_file is None:
+        raise FileNotFoundError("No heatmap found, run the simulation with output.heatmap enabled first")
+
+    optimised = optimise_config_layout(Config(file_path=args.config), heatmap_file, grid_step=args.grid_step,
+                                       optimise_sizes=args.sizes)
+    print(f"Score {optimised.pop('result')['score']:.3f}")
+    for sensor_key, area in optimised.items():
+        print(f"{sensor_key}: {area}")
@@ -1,17 +1,37 @@
 
+import contextlib
 import time
 
 from memory_profiler import profile
 import random
-from arcRotation import arc_movement_vector, rotation_rings
-from intersectionCalculations import intersection_wrapper  # Import for calculating line-plane intersection
+from arcRotation import arc_movement_vector, rotation_rings, fibonacci_hemisphere
+from intersectionCalculations import intersection_wrapper, intersection_settings  # Import for calculating line-plane intersection
+from intersectionCalculations import configure_intersections, reset_rejected_rays, rejection_summary  # Import for intersection limits
+from batchIntersection import evaluate_ray_bundle  # Import for vectorised ray evaluation
+from batchIntersection import plane_intersections, plane_coordinates  # Import for whole pose intersections
+from batchIntersection import cull_poses, cull_statistics, reset_cull_statistics, cull_summary, cull_ratio  # Import for aperture culling
+from areaIndex import area_index  # Import for the bounding box of the apertures
+from rayBundle import RayBundle  # Import for array based ray storage
+from poseStack import stack_poses, evaluate_pose_stack  # Import for evaluating all poses together
+from poseGenerator import rigid_arc_poses, rigid_arc_angles, fibonacci_hemisphere_poses, pose_chunks  # Import for closed-form and chunked poses
+from poseGenerator import PoseSequence, face_origin, rigid_arc_pose_arrays  # Import for poses added by arc refinement
+from arcRefinement import refine_arc  # Import for adaptive angular refinement of the rigid arc
+from parallelSweep import WorkerPool  # Import for evaluating poses across processes
+from seeding import resolve_root_seed, ray_generator, pose_generator, pose_ray_generator  # Import for reproducible random streams
+from analyticOverlap import evaluate_pose_analytic  # Import for ray-free expected illumination
+from adaptiveSampling import evaluate_pose_adaptive  # Import for per-pose adaptive ray counts
+from resultsStore import create_results_sink  # Import for buffered results files or the columnar store
+from runLedger import start_run, record_run, config_hash  # Import for the append-only record of runs
+from rayDump import RayDump  # Import for memory-mapped per-ray outcomes
+from sensorHeatmap import SensorHeatmap  # Import for sensor plane hit histograms
+from poseCache import open_pose_cache, run_keys, evaluate_with_cache  # Import for reusing traced pose results
 from line import Line  # Import for Line object
 from plane import Plane  # Import for Plane object
 from areas import Areas  # Import for target areas
+from surfacePipeline import initialise_surfaces  # Import for the surfaces between the aperture and sensor planes
 import numpy as np  # For mathematical operations
 import plotly.graph_objects as go  # For 3D visualization
 
-import csv
 
 import logging
 
@@ -24,39 +44,42 @@ import glob
 # Valid logging levels "DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"
 
 
+# Columns of results.csv
+RESULTS_HEADER = ["sim", "idx", "hits", "misses", "ray count", "sim title"]
+
+
+def resolve_results_path(results_path):
+    """
+    Resolves the configured results path relative to the project directory.
+    """
+    project_root = os.path.dirname(os.path.abspath(__file__))  # Path to main.py
+    return os.path.normpath(os.path.join(project_root, "..", results_path))
+
+
 def prepare_output(results_path):
     """
     Prepares the output file by creating it if it does not exist
     and adding a header row.
+    Returns the index of the new simulation, reserved in the run ledger.
     """
     print("Preparing output")
 
     # Ensure the `results_path` is resolved relative to the project directory
-    project_root = os.path.dirname(os.path.abspath(__file__))  # Path to main.py
-    results_path = os.path.normpath(os.path.join(project_root, "..", results_path))
+    results_path = resolve_results_path(results_path)
 
     # Ensure the parent directory exists
     os.makedirs(os.path.dirname(results_path), exist_ok=True)
 
     if not os.path.exists(results_path):
-        sim_idx = 0
         print(f"Creating {results_path}")
-        # Create the file and write the header
+        # Create the file and write the header, runtimes are kept in the run ledger (runs.csv)
         with open(results_path, "w", newline='') as results_file:
-            results_file.write("sim,idx,hits,misses,ray count,sim title,runtime\n")
+            results_file.write(",".join(RESULTS_HEADER) + "\n")
         print(f"Writing header to {results_path}")
     else:
         print(f"File {results_path} already exists")
-        # Check the file content to determine the current simulation index
-        with open(results_path, "r", newline='') as results_file:
-            reader = list(csv.reader(results_file))
-            if len(reader) <= 1:
-                sim_idx = 0
-            else:
-                last_row = reader[-1]
-                sim_idx = int(last_row[0]) + 1
 
-    return sim_idx
+    return start_run(os.path.dirname(results_path), results_path)
 
 
 
@@ -229,18 +252,20 @@ def update_lines_global_positions(lines, new_source_plane):
     return lines
 
 
-def create_lines_from_plane(source_plane, num_lines):
+def create_lines_from_plane(source_plane, num_lines, rng=None, strategy="uniform"):
     """
     Generates random line positions in the plane's local coordinate system.
 
     Args:
         source_plane (Plane): The source plane object.
         num_lines (int): Number of lines to generate.
+        rng (np.random.Generator): Random stream for the positions.
+        strategy (str): Sampling strategy, see Plane.random_points().
 
     Returns:
         list: List of Line objects.
     """
-    local_positions = source_plane.random_points(num_lines)  # Local coordinates
+    local_positions = source_plane.random_points(num_lines, rng, strategy)  # Local coordinates
     # print(f"Local positions: {local_positions}")
     # print(f"Number of lines: {len(local_positions)}")
 
@@ -261,7 +286,7 @@ def intersection_checking(targetArea, intersection_coordinates):
 
     for target in targetArea:
         # Check if the intersection point is in the target area
-        result = target.record_result(intersection_coordinates)
+        result = target.record_result(intersection_coordinates, intersection_settings["tolerance"])
         # logging.debug(f"Checking intersection with {target.title}...")
 
         if result == 1:  # Hit occurs
@@ -272,7 +297,7 @@ def intersection_checking(targetArea, intersection_coordinates):
         return -1, 0
 
 
-def evaluate_line_results(sensorPlane, sensorArea, aperturePlane, apertureAreas, lines):
+def evaluate_line_results(sensorPlane, sensorArea, aperturePlane, apertureAreas, lines, surfaces=()):
     """
     Checks intersections of lines with the sensor plane and evaluates whether they hit the target area.
 
@@ -284,6 +309,7 @@ def evaluate_line_results(sensorPlane, sensorArea, aperturePlane, apertureAreas,
         aperturePlane:
         apertureAreas:
         lines: List of Line objects.
+        surfaces: Optional Surface objects between the aperture plane and the sensor plane.
 
     Returns:
         hit: number of hits.
@@ -298,23 +324,40 @@ def evaluate_line_results(sensorPlane, sensorArea, aperturePlane, apertureAreas,
     for sensors in sensorArea:
         sensors.illumination = 0
 
+    # Lines outside the bounding box of all apertures are missed without checking each aperture
+    aperture_bounds = area_index(aperturePlane, apertureAreas, intersection_settings["tolerance"])
+    culled = 0
+
     for line in lines:
         line.result = 0
         # Calculate intersection between the line and the aperture plane
         aperture_intersection_coordinates = intersection_wrapper(aperturePlane, line)
-        # Set intersection coordinate of line object
-        line.intersection_coordinates = aperture_intersection_coordinates
+        # Set intersection coordinate of line object, NaN for a rejected intersection as in a RayBundle
+        line.intersection_coordinates = (aperture_intersection_coordinates
+                                         if aperture_intersection_coordinates is not None else np.full(3, np.nan))
 
         # Check if intersection with apertures
-        aperture_intersection, _ = intersection_checking(apertureAreas, aperture_intersection_coordinates)
+        x, y = plane_coordinates(aperturePlane, line.intersection_coordinates)
+        if not aperture_bounds.in_bounds(np.array([[x, y]]))[0]:
+            culled += 1
+            aperture_intersection = 0
+        else:
+            aperture_intersection, _ = intersection_checking(apertureAreas, aperture_intersection_coordinates)
         if aperture_intersection == 1:  # Hit, at apertures
 
+            # Check the line passes every further surface, in order
+            if not passes_surfaces(surfaces, line):
+                miss += 1
+                miss_list.append(line.line_id)
+                continue
+
             # Get intersection coordinates with sensor plane
             sensor_intersection_coordinates = intersection_wrapper(sensorPlane, line)
 
             # Check intersection with sensor areas
             sensor_intersection, sensor = intersection_checking(sensorArea, sensor_intersection_coordinates)
-            line.intersection_coordinates = sensor_intersection_coordinates
+            line.intersection_coordinates = (sensor_intersection_coordinates
+                                             if sensor_intersection_coordinates is not None else np.full(3, np.nan))
 
             if sensor_intersection == 1:  # Intersection occurs at sensor
                 hit, line.result, sensor.illumination = hit + 1, 1, sensor.illumination + 1
@@ -334,34 +377,101 @@ def evaluate_line_results(sensorPlane, sensorArea, aperturePlane, apertureAreas,
             miss_list.append(line.line_id)
             continue
 
+    cull_statistics["rays"] += len(lines)
+    cull_statistics["culled rays"] += culled
+
     return hit, miss, hit_list, miss_list
 
 
-def handle_results(sensor_objects, sim_idx, idx, config):
+def culled_line_results(sensorArea, aperturePlane, lines):
     """
-    Logs one row of hit counts per sensor for a given simulation and arc position.
-    Structure: [sim, idx, Sensor A, Sensor B, ..., Sensor N]
+    Results of a pose culled by cull_poses(), every line misses at the aperture plane.
+    The intersections with the aperture plane are still set, in one batch, for visualisation.
+
+    Returns:
+        hit, miss, hit_list, miss_list: As evaluate_line_results().
+    """
+    for sensors in sensorArea:
+        sensors.illumination = 0
+
+    positions = np.array([line.position for line in lines], dtype=float)
+    directions = np.array([line.direction for line in lines], dtype=float)
+    intersection_coordinates = plane_intersections(aperturePlane, positions, directions)
+
+    for line, coordinates in zip(lines, intersection_coordinates):
+        line.result = 0
+        line.intersection_coordinates = coordinates
+
+    return 0, len(lines), [], [line.line_id for line in lines]
+
+
+def passes_surfaces(surfaces, line):
+    """
+    Checks whether a line passes every surface between the aperture and sensor planes.
+    A line stopped by a surface keeps its intersection with it.
     """
+    for surface in surfaces:
+        surface_intersection_coordinates = intersection_wrapper(surface.plane, line)
+        surface_intersection, _ = intersection_checking(surface.areas, surface_intersection_coordinates)
 
-    file_path = "../data/sensor_results.csv"
-    write_header = not os.path.exists(file_path) or (sim_idx == 0 and idx == 0)
+        # Through an opening of a "pass" surface, or clear of the obstacles of a "block" surface
+        if (surface_intersection == 1) == surface.blocking:
+            line.intersection_coordinates = (surface_intersection_coordinates
+                                             if surface_intersection_coordinates is not None else np.full(3, np.nan))
+            return False
 
+    return True
+
+
+def handle_results(sensor_objects, sim_idx, idx, sink):
+    """
+    Logs one row of hit counts per sensor for a given simulation and arc position.
+    Structure: [sim, idx, Sensor A, Sensor B, ..., Sensor N]
+    """
     # Prepare row
     row_data = [sim_idx, idx]
     sensor_titles = [sensor.title for sensor in sensor_objects]
     sensor_hits = [sensor.illumination for sensor in sensor_objects]
 
-    # Write header if needed
-    if write_header:
-        header = ["sim", "idx"] + sensor_titles
-        with open(file_path, "w", newline="") as f:
-            writer = csv.writer(f)
-            writer.writerow(header)
+    # Header is written if the file is new, or replaced for the first simulation
+    sink.write_row("../data/sensor_results.csv", row_data + sensor_hits, header=["sim", "idx"] + sensor_titles,
+                   overwrite=sim_idx == 0)
+
+
+def write_sensor_results_table(sensor_objects, sim_idx, illumination, sink, start=0):
+    """
+    Logs the hit counts per sensor for every arc position of a simulation (or of a chunk of them), in one pass.
+    Table equivalent of handle_results(), with the same structure: [sim, idx, Sensor A, Sensor B, ..., Sensor N]
+
+    Args:
+        sensor_objects: List of sensor areas, giving the column titles.
+        sim_idx: Simulation index.
+        illumination (np.array): (P,S) hits on each sensor at each arc position.
+        sink (ResultsSink): Output files of the run.
+        start (int): Index of the first arc position.
+    """
+    sink.write_rows("../data/sensor_results.csv",
+                    ([sim_idx, idx] + sensor_hits for idx, sensor_hits in enumerate(illumination.tolist(), start)),
+                    header=["sim", "idx"] + [sensor.title for sensor in sensor_objects], overwrite=sim_idx == 0)
+
+
+def write_results_table(config, sim_idx, results, ray_counts, sink, start=0):
+    """
+    Logs the hits and misses at every arc position of a simulation (or of a chunk of them) to results.csv.
+    Structure: [sim, idx, hits, misses, ray count, sim title]
+
+    Args:
+        results (np.array): (P,2) hits and misses at each arc position.
+        ray_counts: Rays fired at each arc position, or a single count for all positions.
+        sink (ResultsSink): Output files of the run.
+        start (int): Index of the first arc position.
+    """
+    ray_counts = np.broadcast_to(ray_counts, len(results)).tolist()
 
-    # Write data row
-    with open(file_path, "a", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow(row_data + sensor_hits)
+    sink.write_rows("../data/results.csv",
+                    ([sim_idx, idx, hit, miss, ray_count, config.output["Sim_title"]]
+                     for idx, ((hit, miss), ray_count) in enumerate(zip(results.tolist(), ray_counts), start)),
+                    header=RESULTS_HEADER)
 
 
 def do_rotation(theta, axis):
@@ -818,7 +928,8 @@ def primary_rotation_handling(sequence_ID, new_plane, next_position, required_an
 
 def move_plane_along_arc(start_plane, all_positions, primary_angle, rotation_axis, secondary_angle, sequence_ID):
     """
-    Moves the plane along a predefined arc while updating line positions.
+    Moves the plane along a predefined arc, yielding the plane at each position in turn.
+    Each plane is built from the previous one, and only the latest is kept, so the sweep is never held in memory.
 
     Args:
         start_plane (Plane): A plane object representing the initial position and orientation.
@@ -834,12 +945,11 @@ def move_plane_along_arc(start_plane, all_positions, primary_angle, rotation_axi
 
         sequence_ID (int): Indicates type of movement sequence. (2 = horizontal circles, or 1 = vertical circles)
 
-    Returns:
-        rotated_planes (list): Transformed plane objects at each step.
-        fig (Plotly figure): Updated visualization.
+    Yields:
+        Plane: Transformed plane object at each step.
     """
 
-    rotated_planes = []
+    previous_plane = None
 
     R_p = None
 
@@ -847,26 +957,6 @@ def move_plane_along_arc(start_plane, all_positions, primary_angle, rotation_axi
     for idx, position in enumerate(all_positions):
         logging.info(f"Performing arc movement {idx}")
 
-        if sequence_ID == 3:
-            logging.debug(f"Step {idx}: Rigid arc facing origin")
-
-            if idx == 0:
-                new_plane = initialise_new_circle(start_plane, position)
-                new_plane.title = f"Plane {idx} - Start"
-            else:
-                new_plane = initialise_new_circle(rotated_planes[idx - 1], position)
-                new_plane.title = f"Plane {idx}"
-
-                # Calculate rotation to face origin
-                R, angle = calculate_rotation_matrix(position, new_plane.direction)
-                new_plane.rotate_plane(R)
-                rotation_angle_deg = np.degrees(angle)
-                logging.debug(f"Plane {idx} rotated {np.round(np.degrees(angle), 2)}° to face origin")
-
-            rotated_planes.append(new_plane)
-            new_plane.print_pose()
-            continue  # Skip other movements
-
         movement_type = determine_movement_type(idx, 1, secondary_angle)
 
         logging.debug(f"Movement type: {movement_type}")
@@ -879,7 +969,7 @@ def move_plane_along_arc(start_plane, all_positions, primary_angle, rotation_axi
 
         if movement_type is None:
             logging.error(f"Error: Unable to determine movement type for position {idx}")
-            return None
+            return
 
         elif movement_type == 1:
 
@@ -930,7 +1020,7 @@ def move_plane_along_arc(start_plane, all_positions, primary_angle, rotation_axi
             logging.debug(f"Step {idx}: Same meridian")
 
             # Create copy of previous plane and translate it to new position
-            new_plane = initialise_new_circle(rotated_planes[idx - 1], position)
+            new_plane = initialise_new_circle(previous_plane, position)
             new_plane.title = f"Plane {idx}"
 
             logging.debug(f"Plane {idx} initial direction: {np.round(new_plane.direction, 2)}")
@@ -940,12 +1030,11 @@ def move_plane_along_arc(start_plane, all_positions, primary_angle, rotation_axi
             logging.debug(f"Plane {idx}: Applying primary rotation {np.round(np.degrees(primary_angle), 2)}°")
             logging.debug(f"Plane {idx} rotated direction: {np.round(new_plane.direction, 2)}")
 
-        # Append new plane from ANY above ^^^^
-        rotated_planes.append(new_plane)
-
+        # Yield new plane from ANY above ^^^^
         new_plane.print_pose()
+        previous_plane = new_plane
 
-    return rotated_planes
+        yield new_plane
 
 
 def visualise_intersections(fig, lines):
@@ -978,15 +1067,30 @@ def visualise_intersections_seq(line):
     Returns:
         Updated Plotly figure
     """
+    return visualise_ray_seq(line.position, line.intersection_coordinates, line.result)
+
+
+def visualise_ray_seq(position, intersection_coordinates, result):
+    """
+    Creates the graphic object for a single ray, from its start position to its intersection.
+
+    Args:
+        position: Global start position of the ray.
+        intersection_coordinates: Final intersection of the ray.
+        result: 1 for a hit, otherwise a miss.
 
-    if line.result == 1:
+    Returns:
+        Plotly Scatter3d object
+    """
+
+    if result == 1:
         color = 'green'
     else:
         color = 'red'
 
-    x = [line.position[0], line.intersection_coordinates[0]]
-    y = [line.position[1], line.intersection_coordinates[1]]
-    z = [line.position[2], line.intersection_coordinates[2]]
+    x = [position[0], intersection_coordinates[0]]
+    y = [position[1], intersection_coordinates[1]]
+    z = [position[2], intersection_coordinates[2]]
 
     scatter_obj = go.Scatter3d(
         x=x, y=y, z=z,
@@ -1006,7 +1110,7 @@ def check_fig_data(fig):
             f"Trace {idx}: Type = {type(trace)}, Name = {trace.name if hasattr(trace, 'name') else 'Unnamed'}")
 
 
-def prepare_line_samples(lines, line_list, sample_size):
+def prepare_line_samples(lines, line_list, sample_size, rng=None):
     """
     Samples list of lines for visualisation
     Returns graphic objects of random lines
@@ -1015,12 +1119,36 @@ def prepare_line_samples(lines, line_list, sample_size):
         lines: List of Line objects
         line_list: line_id list
         sample_size: Number of lines to be selected
+        rng: Random stream for the selection (np.random.Generator)
     :return:
     """
 
     # exit(2)
 
     lines_graphics = []
+
+    sampled_lines = sample_line_ids(line_list, sample_size, rng)
+    if sampled_lines is None:
+        return None
+
+    for samples in sampled_lines:
+        lines_graphics.append(visualise_intersections_seq(lines[samples]))  # Stores line objects
+
+    logging.debug(f"Returning {len(lines_graphics)} lines for visualisation.")
+    return lines_graphics
+
+
+def sample_line_ids(line_list, sample_size, rng=None):
+    """
+    Selects a random sample of line ids, limited to the number of lines available.
+
+    :arg:
+        line_list: line_id list
+        sample_size: Number of lines to be selected
+        rng: Random stream for the selection (np.random.Generator), the global random state if None
+    :return:
+        List of sampled line ids, or None if there are no lines to sample
+    """
     # Validate sample size
 
     if line_list is None or len(line_list) == 0:
@@ -1035,16 +1163,13 @@ def prepare_line_samples(lines, line_list, sample_size):
         sample_size = len(line_list)
 
     # Extract samples
-    sampled_lines = random.sample(line_list, sample_size)
+    if rng is None:
+        return random.sample(line_list, sample_size)
 
-    for samples in sampled_lines:
-        lines_graphics.append(visualise_intersections_seq(lines[samples]))  # Stores line objects
-
-    logging.debug(f"Returning {len(lines_graphics)} lines for visualisation.")
-    return lines_graphics
+    return rng.choice(line_list, sample_size, replace=False).tolist()
 
 
-def rigid_arc_rotation(radius, arc_resolution_deg, tilt_angles):
+def rigid_arc_rotation(radius, arc_resolution_deg, tilt_angles, sink):
     """
     Generates 3D coordinates along a semicircular arc in the x-z plane,
     then applies a series of rotations about the x-axis using the provided tilt angles.
@@ -1053,12 +1178,14 @@ def rigid_arc_rotation(radius, arc_resolution_deg, tilt_angles):
         radius (float): Radius of the arc.
         arc_resolution_deg (float): Angle increment for arc sampling.
         tilt_angles (list or array): List of angles to rotate arc about x-axis.
+        sink (ResultsSink): Output files of the run, the angles are logged to rigid_arc_angles.csv.
+            None to not log them, as with arc refinement, where the angles are only known once evaluated.
 
     Returns:
         np.ndarray: Stacked array of all rotated arc positions in Cartesian coordinates (shape: [N_total, 3])
     """
     # Generate arc angles from 0 to 180 degrees (semi-circle)
-    arc_angles = np.arange(0, 180 + arc_resolution_deg, arc_resolution_deg)
+    arc_angles = rigid_arc_angles(arc_resolution_deg)
     theta_arc = np.radians(arc_angles)
 
     # Arc in x-z plane
@@ -1070,10 +1197,6 @@ def rigid_arc_rotation(radius, arc_resolution_deg, tilt_angles):
 
     all_rotated_positions = []
 
-    with open("../data/rigid_arc_angles.csv", "w", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow(["tilt_angle_deg", "arc_angle_deg"])  # Header row
-
     for tilt_angle_deg in tilt_angles:
         # Rotation matrix about x-axis
         tilt_rad = np.radians(tilt_angle_deg)
@@ -1083,10 +1206,9 @@ def rigid_arc_rotation(radius, arc_resolution_deg, tilt_angles):
             [0, np.sin(tilt_rad), np.cos(tilt_rad)]
         ])
 
-        for arc_angle in arc_angles:
-            with open("../data/rigid_arc_angles.csv", "a", newline="") as f:
-                writer = csv.writer(f)
-                writer.writerow([tilt_angle_deg, arc_angle])
+        if sink is not None:
+            sink.write_rows("../data/rigid_arc_angles.csv", ([tilt_angle_deg, arc_angle] for arc_angle in arc_angles),
+                            header=["tilt_angle_deg", "arc_angle_deg"], overwrite=True)
 
         # Apply rotation
         rotated_arc = R_x @ arc_points  # shape: [3, N]
@@ -1155,7 +1277,7 @@ def get_vertical_params(config):
     return arc_phi_angle, arc_theta_angle, sequence_ID, rotation_axis, rotation_step
 
 
-def get_rigid_params(config):
+def get_rigid_params(config, sink):
     """
     Returns the parameters for rigid arc movement.
     Also, directly computes the 'rigid_arc_positions' array.
@@ -1172,17 +1294,347 @@ def get_rigid_params(config):
     rotation_step = np.radians(-10)
 
     # Generate positions for rotation in rigid arc
-    rigid_arc_positions = rigid_arc_rotation(config.arc_movement["radius"], rigid_arc_step, tilt_angles)
+    rigid_arc_positions = rigid_arc_rotation(config.arc_movement["radius"], rigid_arc_step, tilt_angles, sink)
 
     logging.debug(f"Rigid arc positions shape: {np.shape(rigid_arc_positions)}")
 
     return rigid_arc_step, tilt_angles, sequence_ID, rotation_axis, rotation_step, rigid_arc_positions
 
 
+def get_fibonacci_params(config, sink):
+    """
+    Returns the parameters for Fibonacci hemisphere movement.
+    Also, directly computes the positions, and logs their angles to fibonacci_angles.csv.
+    """
+    logging.info("Fibonacci hemisphere movement")
+
+    num_poses = config.arc_movement["fibonacci_poses"]
+    max_polar = config.arc_movement["fibonacci_max_polar"]
+
+    sequence_ID = 4  # 4 for Fibonacci hemisphere movement
+
+    all_positions, polar = fibonacci_hemisphere(config.arc_movement["radius"], num_poses, max_polar)
+
+    sink.write_rows("../data/fibonacci_angles.csv", np.degrees(polar[:, 1:]).tolist(),
+                    header=["azimuth_deg", "polar_deg"], overwrite=True)
+
+    logging.debug(f"Fibonacci positions shape: {np.shape(all_positions)}")
+
+    return num_poses, max_polar, sequence_ID, all_positions
+
+
+def evaluate_poses_sequentially(config, sim_idx, num_lines, lines, rotated_planes, sensorPlane, sensorAreas,
+                                aperturePlane, aperture_areas, sink, run_idx=0, ray_dump=None, heatmap=None,
+                                surfaces=(), pose_cache=None, start=0, sample_lines=True):
+    """
+    Evaluates the lines at each pose in turn, logging results and sampling lines for visualisation.
+
+    Args:
+        lines: List of Line objects ("basic" optimisation level) or a RayBundle.
+        rotated_planes (list): Source plane at each pose of a chunk of the sweep.
+        sink (ResultsSink): Output files of the run.
+        run_idx (int): Index of the run, selects the random streams of each pose.
+        ray_dump (RayDump): Optional store for the outcome of every ray (RayBundle only).
+        heatmap (SensorHeatmap): Optional sensor plane histogram to accumulate (RayBundle only).
+        surfaces (list): Optional Surface objects between the aperture plane and the sensor plane.
+        pose_cache (PoseCache): Optional cache of sensor counts, poses found in it are not traced
+            and have no lines to visualise.
+        start (int): Index of the chunk's first pose in the sweep.
+        sample_lines (bool): Sample lines for visualisation, otherwise each pose has an empty list.
+
+    Returns:
+        results (np.array): (P,2) hits and misses at each pose of the chunk.
+        line_scatter_objects (list): Sampled line graphics for each pose of the chunk.
+    """
+    optimization_level = config.performance["optimization_level"]
+    line_scatter_objects = []
+    results = np.zeros((len(rotated_planes), 2))
+
+    if pose_cache is not None:
+        local_positions = (np.array([line.local_position for line in lines], dtype=float)
+                           if optimization_level == "basic" else lines.local_positions)
+        pose_keys, sensor_keys, shadows = run_keys(local_positions, *stack_poses(rotated_planes), sensorPlane,
+                                                   sensorAreas, aperturePlane, aperture_areas, surfaces,
+                                                   intersection_settings)
+
+    def trace_pose_lines(idx, plane):
+        # Evaluates every line at one pose, updating the illumination of each sensor
+        if optimization_level == "basic":
+            update_lines_global_positions(lines, plane)
+            culled, _ = cull_poses(aperturePlane, aperture_areas, plane.corners[None], plane.direction[None],
+                                   len(lines))
+            if culled[0]:
+                return culled_line_results(sensorAreas, aperturePlane, lines)
+            return evaluate_line_results(sensorPlane, sensorAreas, aperturePlane, aperture_areas, lines, surfaces)
+
+        lines.update_global_positions(plane)
+        pose_results = evaluate_ray_bundle(sensorPlane, sensorAreas, aperturePlane, aperture_areas, lines, surfaces)
+        if ray_dump is not None:
+            ray_dump.record_bundle(idx, lines, sensorPlane)
+        if heatmap is not None:
+            heatmap.accumulate(idx, lines.aperture_index, lines.intersection_coordinates)
+
+        return pose_results
+
+    for chunk_idx, plane in enumerate(rotated_planes):  # Check lines for each plane
+        idx = start + chunk_idx
+        logging.info(f"{plane.title}")
+        traced = []
+
+        def trace_pose(pose_indices, sensor_indices):
+            # Traces the pose with every sensor, returning the counts of the requested ones
+            traced.append(trace_pose_lines(idx, plane))
+            return np.array([[sensor.illumination for sensor in sensorAreas]])[:, sensor_indices]
+
+        if pose_cache is not None:
+            counts = evaluate_with_cache(pose_cache, [pose_keys[chunk_idx]], sensor_keys, shadows, trace_pose)[0]
+            if traced:
+                hit, miss, hit_list, miss_list = traced[0]
+            else:  # Found in the cache, no rays were traced
+                for sensor, count in zip(sensorAreas, counts):
+                    sensor.illumination = int(count)
+                hit, miss, hit_list, miss_list = int(counts.sum()), num_lines - int(counts.sum()), [], []
+        else:
+            hit, miss, hit_list, miss_list = trace_pose_lines(idx, plane)
+
+        handle_results(sensorAreas, sim_idx, idx, sink)
+        logging.debug(f"{plane.title} has {hit} hits and {miss} misses")
+
+        results[chunk_idx, 0] = hit
+        results[chunk_idx, 1] = miss
+
+        sink.write_row("../data/results.csv",
+                       [sim_idx, idx, results[chunk_idx, 0], results[chunk_idx, 1], num_lines,
+                        config.output["Sim_title"]],
+                       header=RESULTS_HEADER)
+
+        if not sample_lines:
+            line_scatter_objects.append([])
+            continue
+
+        # Sample lines for visualisation
+        logging.debug(f"Selecting hits for visualisation for plane {idx}")
+        lines_for_plane = []
+        rng = pose_generator(config.simulation["seed"], run_idx, idx)
+
+        hits_visualised = (prepare_line_samples(lines, hit_list, config.visualization["hits_to_display"], rng))
+
+        if hits_visualised is not None:
+            lines_for_plane.extend(hits_visualised)
+
+        logging.debug(f"Selecting misses for visualisation for plane {idx}")
+        misses_visualised = (prepare_line_samples(lines, miss_list, config.visualization["misses_to_display"], rng))
+
+        if misses_visualised is not None:
+            lines_for_plane.extend(misses_visualised)
+
+        # Stores line objects for all planes
+        line_scatter_objects.append(lines_for_plane)
+        logging.debug(f"Line scatter objects: {type(line_scatter_objects)} length {len(line_scatter_objects)}")
+
+    return results, line_scatter_objects
+
+
+def evaluate_poses_stacked(config, sim_idx, num_lines, lines, rotated_planes, sensorPlane, sensorAreas,
+                           aperturePlane, aperture_areas, sink, ray_dump=None, heatmap=None, surfaces=(),
+                           pose_cache=None, start=0, worker_pool=None):
+    """
+    Evaluates the ray bundle at all poses together ("tensor" optimisation level, or more than one worker),
+    writing the complete results tables in one pass.
+    With a worker pool (performance.num_workers above 1), the poses are split across its worker processes.
+
+    Individual rays are not kept, so no lines are sampled for visualisation.
+    With a ray dump, the outcome of every ray is written to it as the poses are traced,
+    and with a heatmap, the sensor plane intersections are binned.
+    With a pose cache, only the poses and sensors missing from it are traced.
+    The poses may be one chunk of the sweep, starting at pose index start.
+
+    Returns:
+        results (np.array): (P,2) hits and misses at each pose of the chunk.
+        line_scatter_objects (list): Empty list of line graphics for each pose.
+    """
+    bases, positions = stack_poses(rotated_planes)
+
+    # The chunk's rows of the ray dump and heatmap
+    stop = start + len(bases)
+    if heatmap is not None:
+        heatmap = heatmap.window(start, stop)
+
+    def trace_poses(pose_indices, sensor_indices):
+        # Traces the given poses with the given sensors
+        if worker_pool is not None:
+            return worker_pool.evaluate(bases[pose_indices], positions[pose_indices], heatmap=heatmap,
+                                        first_pose=start, sensor_indices=sensor_indices)
+
+        areas = [sensorAreas[sensor_idx] for sensor_idx in sensor_indices]
+        return evaluate_pose_stack(sensorPlane, areas, aperturePlane, aperture_areas, lines.local_positions,
+                                   bases[pose_indices], positions[pose_indices], config.performance["memory_budget_mb"],
+                                   ray_dump.outcomes[start:stop] if ray_dump else None, heatmap, surfaces)
+
+    if pose_cache is not None:
+        pose_keys, sensor_keys, shadows = run_keys(lines.local_positions, bases, positions, sensorPlane, sensorAreas,
+                                                   aperturePlane, aperture_areas, surfaces, intersection_settings)
+        illumination = evaluate_with_cache(pose_cache, pose_keys, sensor_keys, shadows,
+                                           lambda pose_indices, sensor_indices:
+                                           trace_poses(pose_indices, sensor_indices)[2])
+        hits = illumination.sum(axis=1)
+        misses = num_lines - hits
+    else:
+        hits, misses, illumination = trace_poses(np.arange(len(bases)), range(len(sensorAreas)))
+
+    results = np.column_stack((hits, misses)).astype(float)
+
+    write_sensor_results_table(sensorAreas, sim_idx, illumination, sink, start)
+    write_results_table(config, sim_idx, results, num_lines, sink, start)
+
+    # Leave the sensors holding the final pose, as after the sequential evaluation
+    for sensor, count in zip(sensorAreas, illumination[-1]):
+        sensor.illumination = int(count)
+
+    return results, [[] for _ in rotated_planes]
+
+
+def evaluate_poses_analytic(config, sim_idx, num_lines, rotated_planes, sensorPlane, sensorAreas, aperturePlane,
+                            aperture_areas, sink, start=0):
+    """
+    Computes the expected hits at each pose from the overlap of the source, aperture and sensor areas
+    ("analytic" optimisation level). Valid for the collimated source, where every ray leaves along the plane normal.
+    The intersection settings apply as for traced rays (see expected_illumination()), but not further surfaces.
+
+    Results are logged in the same columns as a ray traced run, with fractional hit counts.
+    The poses may be one chunk of the sweep, starting at pose index start.
+
+    Returns:
+        results (np.array): (P,2) expected hits and misses at each pose of the chunk.
+        line_scatter_objects (list): Empty list of line graphics for each pose (no rays are traced).
+    """
+    results = np.zeros((len(rotated_planes), 2))
+    illumination = np.zeros((len(rotated_planes), len(sensorAreas)))
+
+    for idx, plane in enumerate(rotated_planes):
+        results[idx] = evaluate_pose_analytic(plane, sensorPlane, sensorAreas, aperturePlane, aperture_areas,
+                                              num_lines)
+        illumination[idx] = [sensor.illumination for sensor in sensorAreas]
+        logging.debug(f"{plane.title} has {results[idx, 0]:.2f} expected hits")
+
+    write_sensor_results_table(sensorAreas, sim_idx, illumination, sink, start)
+    write_results_table(config, sim_idx, results, num_lines, sink, start)
+
+    return results, [[] for _ in rotated_planes]
+
+
+def evaluate_poses_adaptive(config, sim_idx, num_lines, rotated_planes, sensorPlane, sensorAreas, aperturePlane,
+                            aperture_areas, sink, run_idx=0, surfaces=(), start=0):
+    """
+    Fires rays at each pose in batches of simulation.adaptive_batch_size until the 95% confidence interval of every
+    sensor's hit fraction is narrower than ±simulation.adaptive_tolerance, or num_lines rays have been fired.
+    Poses facing away from the apertures stop after the first batch.
+
+    The ray count column of results.csv records the rays fired at each pose.
+    Rays are drawn afresh at every pose, so no lines are kept for visualisation.
+    The poses may be one chunk of the sweep, starting at pose index start.
+
+    Returns:
+        results (np.array): (P,2) hits and misses at each pose of the chunk.
+        line_scatter_objects (list): Empty list of line graphics for each pose.
+    """
+    batch_size = config.simulation["adaptive_batch_size"]
+    tolerance = config.simulation["adaptive_tolerance"]
+    seed = config.simulation["seed"]
+
+    results = np.zeros((len(rotated_planes), 2))
+    illumination = np.zeros((len(rotated_planes), len(sensorAreas)), dtype=int)
+    ray_counts = np.zeros(len(rotated_planes), dtype=int)
+
+    for idx, plane in enumerate(rotated_planes):
+        hit, miss, illumination[idx], ray_counts[idx] = evaluate_pose_adaptive(
+            plane, sensorPlane, sensorAreas, aperturePlane, aperture_areas,
+            pose_ray_generator(seed, run_idx, start + idx), batch_size, num_lines, tolerance,
+            config.simulation["sampling"], surfaces)
+        results[idx] = hit, miss
+        logging.debug(f"{plane.title} has {hit} hits and {miss} misses from {ray_counts[idx]} rays")
+
+    logging.info(f"Adaptive sampling fired {ray_counts.sum()} rays at poses {start} to {start + len(ray_counts) - 1},"
+                 f" {ray_counts.sum() / (num_lines * len(rotated_planes)):.1%} of the fixed ray count")
+
+    write_sensor_results_table(sensorAreas, sim_idx, illumination, sink, start)
+    write_results_table(config, sim_idx, results, ray_counts, sink, start)
+
+    return results, [[] for _ in rotated_planes]
+
+
+def evaluate_poses_refined(config, sim_idx, num_lines, lines, start_plane, sensorPlane, sensorAreas, aperturePlane,
+                           aperture_areas, sink, surfaces=(), worker_pool=None):
+    """
+    Evaluates the rigid arc with adaptive angular refinement (arc_movement.refinement, see arcRefinement.py).
+
+    Each tilt's arc is first swept in steps of arc_movement.rigid_arc_step. Poses are then added wherever a sensor's
+    response changes by more than arc_movement.refinement_threshold (as a fraction of its peak) between neighbouring
+    poses, until those intervals are no wider than arc_movement.refinement_resolution degrees, with at most
+    arc_movement.refinement_max_poses poses per tilt. Every pose is traced with the same ray bundle,
+    by the worker pool if given, which is reused for every round of every tilt.
+
+    The results tables hold the poses of each tilt in ascending arc angle, and rigid_arc_angles.csv their angles.
+
+    Returns:
+        results (np.array): (P,2) hits and misses at each pose.
+        poses (PoseSequence): The evaluated poses.
+    """
+    radius = config.arc_movement["radius"]
+    memory_budget_mb = config.performance["memory_budget_mb"]
+
+    start_basis = face_origin(np.vstack((start_plane.right, start_plane.up, start_plane.direction)),
+                              start_plane.position)
+
+    bases, positions, results = [], [], []
+    for tilt_angle in config.arc_movement["tilt_angles"]:
+        evaluated = {}  # Arc angle: (basis, position, hits, misses, illumination)
+
+        def evaluate(arc_angles):
+            # Traces the poses at the given arc angles, returning each sensor's response
+            tilt_bases, tilt_positions = rigid_arc_pose_arrays(start_basis, radius, arc_angles,
+                                                               np.full(len(arc_angles), tilt_angle))
+            if worker_pool is not None:
+                hits, misses, illumination = worker_pool.evaluate(tilt_bases, tilt_positions)
+            else:
+                hits, misses, illumination = evaluate_pose_stack(sensorPlane, sensorAreas, aperturePlane,
+                                                                 aperture_areas, lines.local_positions, tilt_bases,
+                                                                 tilt_positions, memory_budget_mb, surfaces=surfaces)
+
+            for record in zip(arc_angles.tolist(), tilt_bases, tilt_positions, hits, misses, illumination):
+                evaluated[record[0]] = record[1:]
+
+            return illumination / num_lines
+
+        arc_angles, _ = refine_arc(evaluate, rigid_arc_angles(config.arc_movement["rigid_arc_step"]),
+                                   config.arc_movement["refinement_threshold"],
+                                   config.arc_movement["refinement_resolution"],
+                                   config.arc_movement["refinement_max_poses"])
+
+        tilt_bases, tilt_positions, hits, misses, illumination = (
+            np.array(column) for column in zip(*[evaluated[angle] for angle in arc_angles.tolist()]))
+        tilt_results = np.column_stack((hits, misses)).astype(float)
+
+        start = sum(len(block) for block in results)
+        write_sensor_results_table(sensorAreas, sim_idx, illumination, sink, start)
+        write_results_table(config, sim_idx, tilt_results, num_lines, sink, start)
+        sink.write_rows("../data/rigid_arc_angles.csv", ([tilt_angle, arc_angle] for arc_angle in arc_angles),
+                        header=["tilt_angle_deg", "arc_angle_deg"], overwrite=True)
+
+        bases.append(tilt_bases)
+        positions.append(tilt_positions)
+        results.append(tilt_results)
+
+    # Leave the sensors holding the final pose, as after the sequential evaluation
+    for sensor, count in zip(sensorAreas, illumination[-1]):
+        sensor.illumination = int(count)
+
+    poses = PoseSequence(np.concatenate(bases), np.concatenate(positions), start_plane.width, start_plane.length)
+    return np.concatenate(results), poses
+
+
 # @profile(stream=open("memory_profile.log", "w"))
-def main(config, sim_idx=0, num_lines=None):
-    if num_lines is None:
-        num_lines = config.simulation["num_lines"]
+def main(config, sim_idx=0, num_lines=None, run_idx=0, sink=None):
     """
     Runs the main program
         1. Initialises planes and areas.
@@ -1194,14 +1646,47 @@ def main(config, sim_idx=0, num_lines=None):
         7. Displays the final 3D plot and prints the hit/miss results.
     """
 
+    if num_lines is None:
+        num_lines = config.simulation["num_lines"]
+    if sink is None:  # Standalone run, output files are kept open for this call only
+        with create_results_sink(config) as sink:
+            return main(config, sim_idx, num_lines, run_idx, sink)
+
     results_path = config.debugging["data_csv_path"]
     # num_lines = config.simulation["num_lines"]
 
     # ----- Step 1: Initialize planes and areas  ----- #
     sensorPlane, sourcePlane, aperturePlane, sensorAreas, aperture_areas = initialise_planes_and_areas(config)
+    surfaces = initialise_surfaces(config)
+
+    # Intersection limits and edge tolerance, used by every evaluation path
+    configure_intersections(config.intersection)
+    reset_rejected_rays()
+    reset_cull_statistics()
+
+    # "basic" evaluates each Line object in turn, "vectorised" evaluates all rays of a pose as arrays,
+    # "tensor" evaluates all rays at all poses together, "analytic" computes the expected hits without rays
+    optimization_level = config.performance["optimization_level"]
+    logging.info(f"Optimisation level: {optimization_level}")
+
+    # Adaptive runs treat num_lines as the per-pose ray cap, drawing rays at each pose
+    adaptive = config.simulation["adaptive"] and optimization_level != "analytic"
 
     # ----- Step 2: Create lines from source plane ----- #
-    lines = create_lines_from_plane(sourcePlane, num_lines)
+    # Rays are drawn from a stream of the root seed, so both optimisation levels see the same rays
+    seed = resolve_root_seed(config)
+    logging.info(f"Root seed {seed}, run {run_idx}")
+
+    sampling = config.simulation["sampling"]
+    logging.info(f"Sampling strategy: {sampling}")
+
+    if optimization_level == "basic":
+        lines = create_lines_from_plane(sourcePlane, num_lines, ray_generator(seed, run_idx), sampling)
+    elif optimization_level == "analytic" or adaptive:
+        lines = None
+    else:
+        lines = RayBundle.from_plane(sourcePlane, num_lines, ray_generator(seed, run_idx), sampling)
+        logging.info(f"Ray bundle holds {num_lines} rays in {lines.nbytes / 1e6:.2f} MB")
 
     # ----- Step 3: Create 3D plot and visualize environment ----- #
     fig = initialise_3d_plot(sensorPlane)  # Applies plot formatting and global axes
@@ -1219,6 +1704,12 @@ def main(config, sim_idx=0, num_lines=None):
     if config.visualization["show_aperture_area"]:
         for aperture in aperture_areas:  # Display all defined apertures on the plot
             fig = visualise_environment(fig, aperture, config.visualization["color_aperture_area"])
+    for surface in surfaces:  # Further surfaces are shown in the aperture colours
+        if config.visualization["show_aperture_plane"]:
+            fig = visualise_environment(fig, surface.plane, config.visualization["color_aperture_plane"])
+        if config.visualization["show_aperture_area"]:
+            for area in surface.areas:
+                fig = visualise_environment(fig, area, config.visualization["color_aperture_area"])
 
     sensorPlane.title = "Parent axis"
     sensorPlane.print_pose()
@@ -1235,6 +1726,7 @@ def main(config, sim_idx=0, num_lines=None):
     horizontal_circles = config.arc_movement["horizontal_circles"]
     vertical_circles = config.arc_movement["vertical_circles"]
     rigid_arc = config.arc_movement["rigid_arc"]
+    fibonacci = config.arc_movement["fibonacci_hemisphere"]
 
     # Initialise variables
     arc_phi_angle = None
@@ -1243,6 +1735,7 @@ def main(config, sim_idx=0, num_lines=None):
     rotation_axis = None
     rotation_step = 0.0
     rigid_positions = None
+    refine = False
 
     # Read from JSON config, set up for style of movement
     if horizontal_circles:
@@ -1279,12 +1772,26 @@ def main(config, sim_idx=0, num_lines=None):
         )
 
     elif rigid_arc:
+        # With arc refinement the poses are chosen as the arc is evaluated (Step 6), which logs their angles
+        refine = config.arc_movement["refinement"] and config.arc_movement["execute_movements"]
+        if refine and (lines is None or optimization_level == "basic"):
+            logging.warning("Arc refinement needs a fixed ray bundle (vectorised or tensor, not adaptive), skipping")
+            refine = False
+
         (arc_phi_angle,
          arc_theta_angle,
          sequence_ID,
          rotation_axis,
          rotation_step,
-         all_positions) = get_rigid_params(config)
+         all_positions) = get_rigid_params(config, None if refine else sink)
+
+        secondary_movement = np.zeros(len(all_positions))  # not needed
+
+    elif fibonacci:
+        (arc_phi_angle,
+         arc_theta_angle,
+         sequence_ID,
+         all_positions) = get_fibonacci_params(config, sink)
 
         secondary_movement = np.zeros(len(all_positions))  # not needed
 
@@ -1302,7 +1809,15 @@ def main(config, sim_idx=0, num_lines=None):
 
     # -- Phase 3: Apply the plane along the arc -- #
     # Move plane along arc and update lines
-    if config.arc_movement["execute_movements"]:
+    # Poses are evaluated one chunk at a time (Step 6), so only the current chunk of planes is held in memory
+    if config.arc_movement["execute_movements"] and sequence_ID == 3:
+        # Every rigid arc pose is computed directly from its arc and tilt angles
+        rotated_planes = rigid_arc_poses(start_pose_plane, all_positions, arc_phi_angle, arc_theta_angle)
+    elif config.arc_movement["execute_movements"] and sequence_ID == 4:
+        # Every pose faces the origin from its point of the lattice
+        rotated_planes = fibonacci_hemisphere_poses(start_pose_plane, all_positions)
+    elif config.arc_movement["execute_movements"]:
+        # Generator, each plane is built as its chunk is reached
         rotated_planes = move_plane_along_arc(
             start_pose_plane,
             all_positions,
@@ -1314,45 +1829,130 @@ def main(config, sim_idx=0, num_lines=None):
     else:
         rotated_planes = [start_pose_plane]
 
-    # #        ----- Step 6: Evaluate hits and visualize lines -----        #
-    logging.info(f"\n\nChecking intersections:\n")
-    # check_fig_data(fig)
-    line_scatter_objects = []
-    results = np.zeros((len(rotated_planes), 2))
+    num_poses = len(all_positions) if config.arc_movement["execute_movements"] else 1
 
-    for idx, plane in enumerate(rotated_planes):  # Check lines for each plane
-        update_lines_global_positions(lines, plane)
-        logging.info(f"{plane.title}")
-        hit, miss, hit_list, miss_list = evaluate_line_results(sensorPlane, sensorAreas, aperturePlane, aperture_areas,
-                                                               lines)
-        handle_results(sensorAreas, sim_idx, idx, config)
-        logging.debug(f"{plane.title} has {hit} hits and {miss} misses")
-
-        results[idx, 0] = hit
-        results[idx, 1] = miss
-
-        with open("../data/results.csv", "a") as results_file:
-            results_file.write(
-                f"{sim_idx},{idx}, {results[idx, 0]}, {results[idx, 1]},{num_lines}, {config.output["Sim_title"]}\n")
-
-        # Sample lines for visualisation
-        logging.debug(f"Selecting hits for visualisation for plane {idx}")
-        lines_for_plane = []
-
-        hits_visualised = (prepare_line_samples(lines, hit_list, config.visualization["hits_to_display"]))
-
-        if hits_visualised is not None:
-            lines_for_plane.extend(hits_visualised)
-
-        logging.debug(f"Selecting misses for visualisation for plane {idx}")
-        misses_visualised = (prepare_line_samples(lines, miss_list, config.visualization["misses_to_display"]))
-
-        if misses_visualised is not None:
-            lines_for_plane.extend(misses_visualised)
-
-        # Stores line objects for all planes
-        line_scatter_objects.append(lines_for_plane)
-        logging.debug(f"Line scatter objects: {type(line_scatter_objects)} length {len(line_scatter_objects)}")
+    # Optionally keep the outcome of every ray at every pose, for analysis after the run
+    ray_dump = None
+    if config.output["ray_dump"]:
+        if lines is None or optimization_level == "basic":
+            logging.warning("Ray dumps need a fixed ray bundle (vectorised or tensor, not adaptive), skipping")
+        elif refine:
+            logging.warning("Ray dumps need the poses in advance, not arc refinement, skipping")
+        else:
+            # Pose titles are added once the poses have been evaluated
+            ray_dump = RayDump(f"../data/ray_dump_{sim_idx}.dat", num_poses, num_lines, metadata={
+                "sim": sim_idx, "run": run_idx, "seed": seed, "config hash": config_hash(config),
+                "sensors": [sensor.title for sensor in sensorAreas],
+                "apertures": [aperture.title for aperture in aperture_areas]})
+
+    # Optionally bin where the rays cross the sensor plane at every pose, for sensor layout studies
+    heatmap = None
+    if config.output["heatmap"]:
+        if lines is None or optimization_level == "basic":
+            logging.warning("Sensor plane heatmaps need a fixed ray bundle (vectorised or tensor, not adaptive), "
+                            "skipping")
+        elif refine:
+            logging.warning("Sensor plane heatmaps need the poses in advance, not arc refinement, skipping")
+        else:
+            heatmap = SensorHeatmap(sensorPlane, num_poses, config.output["heatmap_bins"])
+
+    # The pose cache and worker processes are closed however the evaluation ends
+    with contextlib.ExitStack() as resources:
+        # Optionally reuse the sensor counts of poses traced by earlier runs
+        pose_cache = None
+        if config.performance["pose_cache"]:
+            if lines is None or ray_dump is not None or heatmap is not None or not sensorAreas:
+                logging.warning("The pose cache needs a fixed ray bundle or lines, no ray dump or heatmap, "
+                                "and at least one sensor, skipping")
+            elif refine:
+                logging.warning("The pose cache is not used with arc refinement, skipping")
+            else:
+                pose_cache = resources.enter_context(open_pose_cache(config))
+
+        # #        ----- Step 6: Evaluate hits and visualize lines -----        #
+        logging.info(f"\n\nChecking intersections:\n")
+        # check_fig_data(fig)
+        if optimization_level == "analytic" and surfaces:
+            logging.warning("The analytic optimisation level only models the aperture plane, ignoring the surfaces")
+        num_workers = config.performance["num_workers"]
+        if num_workers > 1 and (lines is None or optimization_level == "basic"):
+            logging.warning(f"num_workers needs a fixed ray bundle (vectorised or tensor, not adaptive), "
+                            f"running on one process instead of {num_workers}")
+            num_workers = 1
+        stacked = optimization_level == "tensor" or (optimization_level != "basic" and num_workers > 1)
+
+        # Worker processes are started once, holding the rays, geometry and ray dump, and reused by every chunk of poses
+        worker_pool = None
+        if num_workers > 1:
+            worker_pool = resources.enter_context(WorkerPool(sensorPlane, sensorAreas, aperturePlane, aperture_areas,
+                                                             lines.local_positions, num_workers,
+                                                             config.performance["memory_budget_mb"],
+                                                             ray_dump.path if ray_dump else None, num_poses,
+                                                             surfaces))
+            logging.info(f"Evaluating poses across {num_workers} workers")
+
+        # Each chunk of poses is evaluated and written before the next is generated. Planes and sampled lines are only
+        # kept when they are plotted, and pose titles only for the ray dump and heatmap metadata.
+        visualise = config.visualization["show_output_parent"]
+        results = np.zeros((num_poses, 2))
+        kept_planes, line_scatter_objects, pose_titles = [], [], []
+        num_evaluated = 0
+
+        if refine:
+            # The rigid arc is swept coarsely, then refined where the sensor responses change sharply
+            results, refined_poses = evaluate_poses_refined(config, sim_idx, num_lines, lines, start_pose_plane,
+                                                            sensorPlane, sensorAreas, aperturePlane, aperture_areas,
+                                                            sink, surfaces, worker_pool)
+            num_evaluated = len(results)
+            if visualise:
+                kept_planes.extend(refined_poses)
+                line_scatter_objects.extend([] for _ in refined_poses)
+        else:
+            for start, chunk in pose_chunks(rotated_planes, config.performance["pose_chunk_size"]):
+                if optimization_level == "analytic":
+                    chunk_results, chunk_lines = evaluate_poses_analytic(config, sim_idx, num_lines, chunk,
+                                                                         sensorPlane, sensorAreas, aperturePlane,
+                                                                         aperture_areas, sink, start)
+                elif adaptive:
+                    chunk_results, chunk_lines = evaluate_poses_adaptive(config, sim_idx, num_lines, chunk,
+                                                                         sensorPlane, sensorAreas, aperturePlane,
+                                                                         aperture_areas, sink, run_idx, surfaces, start)
+                elif stacked:
+                    chunk_results, chunk_lines = evaluate_poses_stacked(config, sim_idx, num_lines, lines, chunk,
+                                                                        sensorPlane, sensorAreas, aperturePlane,
+                                                                        aperture_areas, sink, ray_dump, heatmap,
+                                                                        surfaces, pose_cache, start, worker_pool)
+                else:
+                    chunk_results, chunk_lines = evaluate_poses_sequentially(config, sim_idx, num_lines, lines, chunk,
+                                                                             sensorPlane, sensorAreas, aperturePlane,
+                                                                             aperture_areas, sink, run_idx, ray_dump,
+                                                                             heatmap, surfaces, pose_cache, start,
+                                                                             visualise)
+
+                num_evaluated = start + len(chunk)
+                results[start:num_evaluated] = chunk_results
+                if visualise:
+                    kept_planes.extend(chunk)
+                    line_scatter_objects.extend(chunk_lines)
+                if ray_dump is not None or heatmap is not None:
+                    pose_titles.extend(plane.title for plane in chunk)
+                logging.debug(f"Evaluated poses {start} to {num_evaluated - 1} of {num_poses}")
+
+        results = results[:num_evaluated]
+
+    if rejection_summary():
+        logging.warning(f"Rays without a valid intersection: {rejection_summary()}")
+    if cull_summary():
+        logging.info(f"Aperture culling: {cull_summary()}")
+
+    if pose_cache is not None:
+        logging.info(f"Pose cache: {pose_cache.hits} of {pose_cache.hits + pose_cache.misses} sensor counts reused")
+    if ray_dump is not None:
+        ray_dump.update_metadata(poses=pose_titles)
+        ray_dump.close()
+    if heatmap is not None:
+        heatmap.save(f"../data/heatmap_{sim_idx}.npz", metadata={
+            "sim": sim_idx, "ray_count": num_lines, "poses": pose_titles})
 
     #        ----- Step 7: Display the plot and results -----        #
     # Show any plot
@@ -1360,7 +1960,7 @@ def main(config, sim_idx=0, num_lines=None):
 
         # show animation or static plot
         if config.visualization["animated_plot"]:
-            fig = generate_arc_animation(fig, rotated_planes, line_scatter_objects, results)
+            fig = generate_arc_animation(fig, kept_planes, line_scatter_objects, results)
             logging.info("Animated plot generated.")
 
             # create_gif_from_frames()
@@ -1369,7 +1969,7 @@ def main(config, sim_idx=0, num_lines=None):
 
         else:
 
-            fig = generate_static_arc_plot(config, fig, rotated_planes, line_scatter_objects)
+            fig = generate_static_arc_plot(config, fig, kept_planes, line_scatter_objects)
             logging.info("Static plot generated.")
 
             if config.output["save_static_png"]:
@@ -1394,29 +1994,29 @@ def run_all_test(config, num_lines):
 
         sim_idx = prepare_output(config.debugging["data_csv_path"])
         start_time = time.time()
-        main(config, sim_idx, num_lines)
+        with create_results_sink(config) as sink:
+            main(config, sim_idx, num_lines, run_idx=i, sink=sink)
         end_time = time.time()
         runtime = end_time - start_time
 
-        with open("../data/results.csv", "r") as f:
-            lines = f.readlines()
-
-        updated_lines = []
-        for line in lines:
-            if line.startswith(f"{sim_idx},"):
-                line = line.strip() + f",{runtime:.4f}\n"
-            else:
-                line = line if line.endswith("\n") else line + "\n"
-            updated_lines.append(line)
-
-        with open("../data/results.csv", "w") as f:
-            f.writelines(updated_lines)
+        data_dir = os.path.dirname(resolve_results_path(config.debugging["data_csv_path"]))
+        record_run(data_dir, sim_idx, runtime, config, num_lines, cull_ratio())
 
 
 if __name__ == "__main__":
+    import argparse
     from config import Config
 
-    config = Config(file_path="C:/Users/temp/IdeaProjects/MENGProject/config.json")
+    parser = argparse.ArgumentParser(description="Run the sensor illumination simulation")
+    parser.add_argument("--config", default="C:/Users/temp/IdeaProjects/MENGProject/config.json",
+                        help="Path to the JSON config file")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Number of worker processes, overrides performance.num_workers")
+    args = parser.parse_args()
+
+    config = Config(file_path=args.config)
+    if args.workers is not None:
+        config.performance["num_workers"] = args.workers
 
     line_tests = [10000]
 
@@ -0,0 +1,218 @@
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from batchIntersection import cull_statistics, reset_cull_statistics
+from intersectionCalculations import configure_intersections, intersection_settings, rejected_rays, reset_rejected_rays
+from poseStack import evaluate_pose_stack
+from rayDump import attach_ray_dump
+from sensorHeatmap import SensorHeatmap
+
+# Per-process state, set once by _initialise_worker() and reused by every task the worker runs
+_worker_state = {}
+
+
+def _initialise_worker(shared_name, shape, geometry, memory_budget_mb, ray_dump_path=None, num_poses=0,
+                       settings=None):
+    """
+    Attaches a worker process to the shared ray positions (and the ray dump, if any) and stores the simulation geometry
+    and intersection limits.
+    """
+    if settings is not None:
+        configure_intersections(settings)
+
+    shared = shared_memory.SharedMemory(name=shared_name)
+
+    _worker_state["shared"] = shared  # Keeps the buffer mapped for the life of the worker
+    _worker_state["local_positions"] = np.ndarray(shape, dtype=np.float64, buffer=shared.buf)
+    _worker_state["geometry"] = geometry
+    _worker_state["memory_budget_mb"] = memory_budget_mb
+    _worker_state["ray_outcomes"] = (attach_ray_dump(ray_dump_path, (num_poses, shape[0]))
+                                     if ray_dump_path is not None else None)
+
+
+def _evaluate_block(start, bases, positions, first_pose=0, sensor_indices=None, heatmap_bins=None):
+    """
+    Evaluates one contiguous block of poses inside a worker.
+
+    Args:
+        start (int): Index of the block's first pose within the poses of the call.
+        first_pose (int): Ray dump row of the call's first pose, when the poses are one chunk of a sweep.
+        sensor_indices (list): Sensors to trace with, all of them if None.
+        heatmap_bins (list): Bins of the sensor plane histogram, None if no heatmap is kept.
+
+    Returns:
+        start: Index of the first pose of the block, used to merge results in pose order.
+        hits, misses, illumination: As returned by evaluate_pose_stack().
+        heatmap_counts: Sensor plane histogram of the block's poses, None if no heatmap is kept.
+        rejected: Rays of the block without a valid intersection, by reason.
+        culling: Culling statistics of the block.
+    """
+    reset_rejected_rays()
+    reset_cull_statistics()
+    sensorPlane, sensorAreas, aperturePlane, apertureAreas, surfaces = _worker_state["geometry"]
+    if sensor_indices is not None:
+        sensorAreas = [sensorAreas[sensor_idx] for sensor_idx in sensor_indices]
+
+    ray_outcomes = _worker_state["ray_outcomes"]
+    if ray_outcomes is not None:
+        ray_outcomes = ray_outcomes[first_pose + start:first_pose + start + len(bases)]
+
+    heatmap = None
+    if heatmap_bins is not None:
+        heatmap = SensorHeatmap(sensorPlane, len(bases), heatmap_bins)
+
+    hits, misses, illumination = evaluate_pose_stack(sensorPlane, sensorAreas, aperturePlane, apertureAreas,
+                                                     _worker_state["local_positions"], bases, positions,
+                                                     _worker_state["memory_budget_mb"], ray_outcomes, heatmap,
+                                                     surfaces)
+
+    if ray_outcomes is not None:
+        ray_outcomes.flush()
+
+    return (start, hits, misses, illumination, heatmap.counts if heatmap is not None else None, dict(rejected_rays),
+            dict(cull_statistics))
+
+
+def partition_poses(num_poses, num_blocks):
+    """
+    Splits pose indices into contiguous blocks.
+
+    Returns:
+        list: (start, stop) index pairs, in pose order.
+    """
+    bounds = np.linspace(0, num_poses, min(num_blocks, num_poses) + 1).astype(int)
+
+    return [(start, stop) for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+
+
+class WorkerPool:
+    """
+    Worker processes evaluating poses with the same set of rays, set up once per run.
+
+    The ray positions are placed in shared memory once, and the geometry, intersection limits and ray dump are sent
+    to each worker once, when it starts. Every later call to evaluate(), e.g. one per chunk of a sweep or per round
+    of arc refinement, only sends the bases and positions of its poses.
+
+    Attributes:
+    num_workers (int): Number of worker processes.
+    num_sensors (int): Number of sensors of the geometry.
+    """
+
+    def __init__(self, sensorPlane, sensorAreas, aperturePlane, apertureAreas, local_positions, num_workers,
+                 memory_budget_mb, ray_dump_path=None, num_poses=0, surfaces=()):
+        """
+        Args:
+            local_positions (np.array): (N,3) ray positions in the source plane's local coordinate system.
+            num_workers (int): Number of worker processes.
+            memory_budget_mb (float): Working memory budget shared between the workers.
+            ray_dump_path (str): Optional RayDump file, each worker writes the ray outcomes of its poses directly.
+            num_poses (int): Poses of the ray dump.
+            surfaces (list): Optional Surface objects between the aperture plane and the sensor plane.
+        """
+        local_positions = np.ascontiguousarray(local_positions, dtype=np.float64)
+
+        self.num_workers = num_workers
+        self.num_sensors = len(sensorAreas)
+
+        self.shared = shared_memory.SharedMemory(create=True, size=max(local_positions.nbytes, 1))
+        np.ndarray(local_positions.shape, dtype=np.float64, buffer=self.shared.buf)[:] = local_positions
+
+        geometry = (sensorPlane, sensorAreas, aperturePlane, apertureAreas, list(surfaces))
+        self.executor = ProcessPoolExecutor(max_workers=num_workers, initializer=_initialise_worker,
+                                            initargs=(self.shared.name, local_positions.shape, geometry,
+                                                      memory_budget_mb / num_workers, ray_dump_path, num_poses,
+                                                      dict(intersection_settings)))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def evaluate(self, bases, positions, blocks_per_worker=4, heatmap=None, first_pose=0, sensor_indices=None):
+        """
+        Evaluates the poses, partitioned into blocks across the workers.
+
+        Each pose is evaluated exactly as by evaluate_pose_stack(), with the intersection limits of the process
+        creating the pool, so results (and the rejected ray counts) match a serial run.
+
+        Args:
+            bases (np.array): (P,3,3) pose bases from stack_poses().
+            positions (np.array): (P,3) pose positions from stack_poses().
+            blocks_per_worker (int): Blocks of poses per worker, smaller blocks balance the load between workers.
+            heatmap (SensorHeatmap): Optional sensor plane histogram of the poses, accumulated by the workers.
+            first_pose (int): Row of the ray dump holding the first pose, when the poses are one chunk of a sweep.
+            sensor_indices (list): Sensors to trace with, in ascending order, all of them if None.
+
+        Returns:
+            hits (np.array): (P,) number of hits at each pose.
+            misses (np.array): (P,) number of misses at each pose.
+            illumination (np.array): (P,S) hits on each sensor traced with at each pose.
+        """
+        num_poses = len(bases)
+        num_sensors = self.num_sensors if sensor_indices is None else len(sensor_indices)
+        if sensor_indices is not None:
+            sensor_indices = list(sensor_indices)
+        heatmap_bins = [heatmap.nx, heatmap.ny] if heatmap is not None else None
+
+        hits = np.zeros(num_poses, dtype=int)
+        misses = np.zeros(num_poses, dtype=int)
+        illumination = np.zeros((num_poses, num_sensors), dtype=int)
+
+        blocks = partition_poses(num_poses, self.num_workers * blocks_per_worker)
+        logging.debug(f"Evaluating {num_poses} poses in {len(blocks)} blocks across {self.num_workers} workers")
+
+        tasks = [self.executor.submit(_evaluate_block, start, bases[start:stop], positions[start:stop], first_pose,
+                                      sensor_indices, heatmap_bins)
+                 for start, stop in blocks]
+
+        for task in tasks:
+            (start, block_hits, block_misses, block_illumination, block_heatmap, block_rejected,
+             block_culling) = task.result()
+            stop = start + len(block_hits)
+
+            hits[start:stop] = block_hits
+            misses[start:stop] = block_misses
+            illumination[start:stop] = block_illumination
+
+            if heatmap is not None:
+                heatmap.counts[start:stop] += block_heatmap
+            rejected_rays.update(block_rejected)
+            cull_statistics.update(block_culling)
+
+        return hits, misses, illumination
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+        if self.shared is not None:
+            self.shared.close()
+            self.shared.unlink()
+            self.shared = None
+
+
+def evaluate_poses_parallel(sensorPlane, sensorAreas, aperturePlane, apertureAreas, local_positions, bases,
+                            positions, num_workers, memory_budget_mb, blocks_per_worker=4, ray_dump_path=None,
+                            heatmap=None, surfaces=()):
+    """
+    Evaluates the same set of rays at every pose, partitioning the poses across worker processes
+    started for this call only. Use a WorkerPool to evaluate several sets of poses with the same workers.
+
+    Args:
+        As WorkerPool and WorkerPool.evaluate(), the ray dump holding exactly these poses.
+
+    Returns:
+        hits (np.array): (P,) number of hits at each pose.
+        misses (np.array): (P,) number of misses at each pose.
+        illumination (np.array): (P,S) hits on each sensor at each pose.
+    """
+    logging.info(f"Evaluating {len(bases)} poses across {num_workers} workers")
+
+    with WorkerPool(sensorPlane, sensorAreas, aperturePlane, apertureAreas, local_positions, num_workers,
+                    memory_budget_mb, ray_dump_path, len(bases), surfaces) as pool:
+        return pool.evaluate(bases, positions, blocks_per_worker, heatmap)
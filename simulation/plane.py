@@ -1,4 +1,5 @@
 import logging
+import warnings
 
 import numpy as np
 from matplotlib import pyplot as plt
@@ -164,20 +165,38 @@ class Plane:
 
         plt.title(f"Area of {self.title}")
 
-    def random_points(self, quantity):
+    def random_points(self, quantity, rng=None, strategy="uniform"):
         """
         Generate random points within the plane boundaries.
 
         Args:
             quantity (int): The number of random points to generate.
+            rng (np.random.Generator): Random stream to draw from, the global numpy state if None.
+            strategy (str): Sampling strategy, one of SAMPLING_STRATEGIES.
+                "uniform" - independent uniform samples.
+                "stratified" - one jittered sample in each of `quantity` cells of a grid over the plane.
+                "sobol" / "halton" - scrambled low discrepancy (quasi-random) sequences.
 
         Returns:
             np.stack: Returns (N,2) array of random (x, y) points on the plane.
         """
+        if rng is None:
+            rng = np.random
 
-        x = np.random.uniform(-self.width / 2, self.width / 2, quantity)
-        y = np.random.uniform(-self.length / 2, self.length / 2, quantity)
-        return np.vstack((x, y)).T  # Returns an (N,2) array
+        if strategy == "uniform":
+            x = rng.uniform(-self.width / 2, self.width / 2, quantity)
+            y = rng.uniform(-self.length / 2, self.length / 2, quantity)
+            return np.vstack((x, y)).T  # Returns an (N,2) array
+
+        if strategy == "stratified":
+            unit_points = stratified_unit_points(quantity, self.width / self.length, rng)
+        elif strategy in ("sobol", "halton"):
+            unit_points = quasi_random_unit_points(quantity, strategy, rng)
+        else:
+            raise ValueError(f"Unknown sampling strategy '{strategy}', expected one of {SAMPLING_STRATEGIES}")
+
+        # Scale from the unit square to the plane
+        return (unit_points - 0.5) * np.array([self.width, self.length])
 
     def plot_points(self, point):
         """
@@ -229,6 +248,61 @@ class Plane:
         # print(f"Corners: {corners_str}")
 
 
+SAMPLING_STRATEGIES = ("uniform", "stratified", "sobol", "halton")
+
+
+def stratified_unit_points(quantity, aspect_ratio, rng):
+    """
+    Jittered stratified samples on the unit square.
+
+    The square is divided into a grid of at least `quantity` cells, shaped to the plane's aspect ratio
+    so the cells are close to square. `quantity` distinct cells are picked at random and one uniform
+    sample is drawn inside each.
+
+    Args:
+        quantity (int): Number of points.
+        aspect_ratio (float): Width / length of the plane.
+        rng: Random stream (np.random.Generator or the np.random module).
+
+    Returns:
+        np.array: (N,2) points in [0, 1) x [0, 1).
+    """
+    columns = max(1, int(round(np.sqrt(quantity * aspect_ratio))))
+    rows = max(1, int(np.ceil(quantity / columns)))
+
+    cells = rng.permutation(columns * rows)[:quantity]
+    cell_origin = np.column_stack((cells % columns, cells // columns))
+
+    return (cell_origin + rng.random((quantity, 2))) / np.array([columns, rows])
+
+
+def quasi_random_unit_points(quantity, strategy, rng):
+    """
+    Scrambled Sobol or Halton points on the unit square.
+
+    Args:
+        quantity (int): Number of points.
+        strategy (str): "sobol" or "halton".
+        rng: Random stream for the scrambling (np.random.Generator, or the np.random module for fresh entropy).
+
+    Returns:
+        np.array: (N,2) points in [0, 1) x [0, 1).
+    """
+    from scipy.stats import qmc
+
+    seed = rng if isinstance(rng, np.random.Generator) else None
+
+    if strategy == "sobol":
+        engine = qmc.Sobol(d=2, scramble=True, seed=seed)
+    else:
+        engine = qmc.Halton(d=2, scramble=True, seed=seed)
+
+    with warnings.catch_warnings():
+        # Sobol warns when quantity is not a power of 2, the points are still well spread
+        warnings.simplefilter("ignore", UserWarning)
+        return engine.random(quantity)
+
+
 def compute_local_axes(normal):
     """
     Compute a local coordinate system (right, up, normal) based on a given normal vector.
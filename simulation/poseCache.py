@@ -0,0 +1,311 @@
+"""
+Disk cache of per-pose sensor counts, so rerunning an unchanged configuration (or one with a single sensor moved)
+only traces the poses and sensors that changed.
+
+Each count is keyed on two hashes:
+    pose key: pose basis and position, the rays (their local positions, so the seed, run, sampling strategy and ray
+        count), the aperture plane and areas, any further surfaces, the sensor plane and the intersection settings.
+    sensor key: the sensor's geometry, and that of any earlier sensor overlapping it (earlier sensors take the rays
+        landing on both, see intersection_checking()).
+
+Entries are kept in an SQLite file, evicting the least recently used beyond a fixed number of entries.
+
+Run from the simulation directory to inspect the cache, or clear it:
+    python poseCache.py
+    python poseCache.py --clear
+"""
+import argparse
+import hashlib
+import logging
+import os
+import sqlite3
+import time
+
+import numpy as np
+
+from areaIndex import area_geometry
+
+# Part of every key, changing it invalidates every stored count
+CACHE_VERSION = 1
+# Keys per SQL query, below SQLite's limit on query parameters
+QUERY_CHUNK = 500
+
+
+def _digest(*values):
+    """
+    Hex digest of a sequence of arrays and scalars.
+    """
+    sha = hashlib.sha1(str(CACHE_VERSION).encode())
+    for value in values:
+        if isinstance(value, np.ndarray):
+            sha.update(np.ascontiguousarray(value, dtype=float).tobytes())
+        else:
+            sha.update(repr(value).encode())
+        sha.update(b"|")
+
+    return sha.hexdigest()
+
+
+def _plane_frame(plane):
+    return np.concatenate((plane.position, plane.right, plane.up, plane.direction, [plane.width, plane.length]))
+
+
+def _areas_geometry(plane, areas):
+    return np.concatenate([np.ravel(array) for array in area_geometry(plane, areas)])
+
+
+def scene_key(local_positions, sensorPlane, aperturePlane, apertureAreas, surfaces, settings):
+    """
+    Hash of everything a pose's result depends on except the pose itself and the sensors.
+
+    Args:
+        local_positions (np.array): (N,3) ray positions in the source plane's local coordinate system.
+        settings (dict): Intersection settings, see configure_intersections().
+    """
+    surface_parts = [value for surface in surfaces
+                     for value in (surface.mode, _plane_frame(surface.plane), _areas_geometry(surface.plane,
+                                                                                              surface.areas))]
+
+    return _digest(local_positions, _plane_frame(sensorPlane), _plane_frame(aperturePlane),
+                   _areas_geometry(aperturePlane, apertureAreas), *surface_parts,
+                   *[settings[key] for key in sorted(settings)])
+
+
+def pose_keys(scene, bases, positions):
+    """
+    (P,) keys of each pose of a scene.
+
+    Args:
+        scene (str): From scene_key().
+        bases (np.array): (P,3,3) pose bases from stack_poses().
+        positions (np.array): (P,3) pose positions.
+    """
+    return [_digest(scene, basis, position) for basis, position in zip(bases, positions)]
+
+
+def sensor_keys(sensorPlane, sensorAreas, tolerance=0.0):
+    """
+    (S,) keys of each sensor, covering the earlier sensors overlapping it.
+
+    Returns:
+        keys (list): Key of each sensor.
+        shadows (list): For each sensor, the indices of the earlier sensors overlapping it.
+    """
+    centres, axes, half_sizes = area_geometry(sensorPlane, sensorAreas)
+    half_sizes = half_sizes + tolerance
+    extents = np.abs(axes[:, 0]) * half_sizes[:, :1] + np.abs(axes[:, 1]) * half_sizes[:, 1:]
+    lower, upper = centres - extents, centres + extents
+
+    keys, shadows = [], []
+    for idx in range(len(sensorAreas)):
+        earlier = [other for other in range(idx)
+                   if np.all((lower[other] <= upper[idx]) & (upper[other] >= lower[idx]))]
+        keys.append(_digest(tolerance, *[np.concatenate((centres[i], axes[i].ravel(), half_sizes[i]))
+                                         for i in earlier + [idx]]))
+        shadows.append(earlier)
+
+    return keys, shadows
+
+
+def run_keys(local_positions, bases, positions, sensorPlane, sensorAreas, aperturePlane, apertureAreas, surfaces,
+             settings):
+    """
+    Keys of every pose and sensor of a run.
+
+    Returns:
+        poses (list): Pose keys, from pose_keys().
+        sensors, shadows (list): From sensor_keys().
+    """
+    scene = scene_key(local_positions, sensorPlane, aperturePlane, apertureAreas, surfaces, settings)
+    sensors, shadows = sensor_keys(sensorPlane, sensorAreas, settings["tolerance"])
+
+    return pose_keys(scene, bases, positions), sensors, shadows
+
+
+class PoseCache:
+    """
+    Sensor counts of previously traced poses, in an SQLite file.
+
+    Attributes:
+    path (str): Path of the cache file.
+    max_entries (int): Number of (pose, sensor) counts kept, least recently used are evicted beyond it.
+    hits, misses (int): Counts found and not found since the cache was opened.
+    """
+
+    def __init__(self, path, max_entries=1000000):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS counts (pose TEXT, sensor TEXT, count INTEGER, "
+                                "last_used REAL, PRIMARY KEY (pose, sensor)) WITHOUT ROWID")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS counts_last_used ON counts (last_used)")
+        self.connection.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def lookup(self, poses, sensors):
+        """
+        Stored counts of each sensor at each pose, marking them as recently used.
+
+        Args:
+            poses (list): Pose keys.
+            sensors (list): Sensor keys.
+
+        Returns:
+            np.array: (P,S) counts, -1 where none is stored.
+        """
+        counts = np.full((len(poses), len(sensors)), -1, dtype=int)
+        pose_rows = {key: idx for idx, key in enumerate(poses)}
+        sensor_columns = {key: idx for idx, key in enumerate(sensors)}
+        now = time.time()
+
+        for start in range(0, len(poses), QUERY_CHUNK):
+            chunk = poses[start:start + QUERY_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+
+            for pose, sensor, count in self.connection.execute(
+                    f"SELECT pose, sensor, count FROM counts WHERE pose IN ({placeholders})", chunk):
+                if sensor in sensor_columns:
+                    counts[pose_rows[pose], sensor_columns[sensor]] = count
+
+            self.connection.execute(f"UPDATE counts SET last_used = ? WHERE pose IN ({placeholders})", [now] + chunk)
+
+        self.connection.commit()
+
+        found = int(np.count_nonzero(counts >= 0))
+        self.hits += found
+        self.misses += counts.size - found
+
+        return counts
+
+    def store(self, poses, sensors, counts):
+        """
+        Stores the counts of some sensors at some poses.
+
+        Args:
+            poses (list): Pose keys.
+            sensors (list): Sensor keys.
+            counts (np.array): (P,S) count of each sensor at each pose.
+        """
+        now = time.time()
+        self.connection.executemany("INSERT OR REPLACE INTO counts VALUES (?, ?, ?, ?)",
+                                    [(pose, sensor, int(counts[row, column]), now)
+                                     for row, pose in enumerate(poses) for column, sensor in enumerate(sensors)])
+        self.evict()
+        self.connection.commit()
+
+    def evict(self):
+        """
+        Deletes the least recently used counts beyond max_entries.
+        """
+        excess = len(self) - self.max_entries
+        if excess > 0:
+            self.connection.execute("DELETE FROM counts WHERE (pose, sensor) IN (SELECT pose, sensor FROM counts "
+                                    "ORDER BY last_used LIMIT ?)", (excess,))
+            logging.debug(f"Evicted {excess} pose cache entries")
+
+    def clear(self):
+        self.connection.execute("DELETE FROM counts")
+        self.connection.commit()
+        self.connection.execute("VACUUM")
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM counts").fetchone()[0]
+
+    def info(self):
+        """
+        Summary of the cache contents.
+
+        Returns:
+            dict: entries, poses, file size in MB, and the oldest and newest use.
+        """
+        entries, poses, oldest, newest = self.connection.execute(
+            "SELECT COUNT(*), COUNT(DISTINCT pose), MIN(last_used), MAX(last_used) FROM counts").fetchone()
+        size_mb = os.path.getsize(self.path) / 1e6 if os.path.exists(self.path) else 0.0
+
+        def when(stamp):
+            return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(stamp)) if stamp is not None else None
+
+        return {"entries": entries, "poses": poses, "size_mb": size_mb, "oldest": when(oldest), "newest": when(newest)}
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+def open_pose_cache(config):
+    """
+    PoseCache configured by performance.pose_cache_path and performance.pose_cache_max_entries.
+    """
+    return PoseCache(config.performance["pose_cache_path"], config.performance["pose_cache_max_entries"])
+
+
+def evaluate_with_cache(cache, poses, sensors, shadows, evaluate):
+    """
+    Sensor counts at each pose, from the cache where stored, tracing only the poses and sensors missing from it.
+
+    Poses missing the same sensors are traced together, with those sensors and the earlier sensors overlapping them.
+
+    Args:
+        cache (PoseCache): The cache.
+        poses (list): Pose keys, from pose_keys().
+        sensors (list): Sensor keys, from sensor_keys().
+        shadows (list): Earlier overlapping sensors of each sensor, from sensor_keys().
+        evaluate (callable): evaluate(pose_indices, sensor_indices) tracing the given poses with the given sensors
+            (in ascending order), returning their (len(pose_indices), len(sensor_indices)) counts.
+
+    Returns:
+        np.array: (P,S) count of each sensor at each pose.
+    """
+    counts = cache.lookup(poses, sensors)
+    missing = counts < 0
+
+    patterns, pattern_index = np.unique(missing, axis=0, return_inverse=True)
+    for pattern_idx, pattern in enumerate(patterns):
+        if not pattern.any():
+            continue
+
+        pose_indices = np.flatnonzero(pattern_index.ravel() == pattern_idx)
+        needed = np.flatnonzero(pattern)
+        traced = sorted(set(needed.tolist()).union(*[shadows[idx] for idx in needed]))
+
+        traced_counts = evaluate(pose_indices, traced)
+        columns = [traced.index(idx) for idx in needed]
+        counts[np.ix_(pose_indices, needed)] = traced_counts[:, columns]
+
+        cache.store([poses[idx] for idx in pose_indices], [sensors[idx] for idx in needed],
+                    counts[np.ix_(pose_indices, needed)])
+        logging.debug(f"Pose cache: traced {len(pose_indices)} poses for {len(needed)} of {len(sensors)} sensors")
+
+    return counts
+
+
+if __name__ == "__main__":
+    from config import Config
+
+    parser = argparse.ArgumentParser(description="Inspect or clear the pose result cache")
+    parser.add_argument("--config", default="../config.json", help="Path to the JSON config file")
+    parser.add_argument("--path", default=None, help="Cache file (default: performance.pose_cache_path)")
+    parser.add_argument("--clear", action="store_true", help="Delete every stored count")
+    args = parser.parse_args()
+
+    cache_config = Config(file_path=args.config)
+    cache_path = args.path or cache_config.performance["pose_cache_path"]
+
+    with PoseCache(cache_path, cache_config.performance["pose_cache_max_entries"]) as pose_cache:
+        if args.clear:
+            pose_cache.clear()
+            print(f"Cleared {cache_path}")
+        for name, value in pose_cache.info().items():
+            print(f"{name}: {value}")
@@ -0,0 +1,331 @@
+"""
+Closed-form pose generation for the rigid arc and the Fibonacci hemisphere.
+
+Every pose's basis is computed directly from its angles or position, as one (P,3,3) array, instead of copying
+the previous pose and rotating it a step further. Poses are held in a PoseSequence, whose items are light
+PoseView objects with the attributes and plotting methods of a Plane, for code written for lists of planes.
+"""
+import itertools
+import logging
+
+import numpy as np
+
+from plane import Plane
+
+
+def rigid_arc_angles(arc_resolution_deg):
+    """
+    Arc angles (degrees) of the rigid arc, from 0 to 180 degrees in steps of arc_resolution_deg.
+    """
+    return np.arange(0, 180 + arc_resolution_deg, arc_resolution_deg)
+
+
+def rotations_about_x(angles):
+    """
+    (P,3,3) rotation matrices about the x-axis, angles in radians.
+    """
+    cos, sin = np.cos(angles), np.sin(angles)
+    rotations = np.zeros((len(angles), 3, 3))
+    rotations[:, 0, 0] = 1
+    rotations[:, 1, 1], rotations[:, 1, 2] = cos, -sin
+    rotations[:, 2, 1], rotations[:, 2, 2] = sin, cos
+
+    return rotations
+
+
+def rotations_about_y(angles):
+    """
+    (P,3,3) rotation matrices about the y-axis, angles in radians.
+    """
+    cos, sin = np.cos(angles), np.sin(angles)
+    rotations = np.zeros((len(angles), 3, 3))
+    rotations[:, 1, 1] = 1
+    rotations[:, 0, 0], rotations[:, 0, 2] = cos, sin
+    rotations[:, 2, 0], rotations[:, 2, 2] = -sin, cos
+
+    return rotations
+
+
+def face_origin_bases(basis, positions):
+    """
+    Rotates a basis, for each position, by the smallest rotation turning its direction towards the origin.
+
+    Args:
+        basis (np.array): (3,3) rows right, up, direction.
+        positions (np.array): (P,3) position of each pose.
+
+    Returns:
+        np.array: (P,3,3) rotated basis at each position.
+    """
+    targets = -positions / np.linalg.norm(positions, axis=1, keepdims=True)
+    direction = basis[2]
+
+    axes = np.cross(direction, targets)
+    sin = np.linalg.norm(axes, axis=1)
+    cos = np.clip(targets @ direction, -1.0, 1.0)
+    angles = np.arctan2(sin, cos)
+
+    # Already facing the origin, no rotation, or facing away, half a turn about the up axis
+    aligned = sin < 1e-12
+    axes[aligned] = basis[1]
+    angles[aligned] = np.where(cos[aligned] > 0, 0.0, np.pi)
+    axes /= np.linalg.norm(axes, axis=1, keepdims=True)
+
+    # Rodrigues' rotation formula applied to each row of the basis: (P,3 rows,3)
+    k = axes[:, None, :]
+    rows = basis[None, :, :]
+    cos_a, sin_a = np.cos(angles)[:, None, None], np.sin(angles)[:, None, None]
+
+    return (rows * cos_a + np.cross(k, rows) * sin_a +
+            k * np.sum(k * rows, axis=2, keepdims=True) * (1 - cos_a))
+
+
+def face_origin(basis, position):
+    """
+    Rotates a basis by the smallest rotation turning its direction towards the origin.
+
+    Args:
+        basis (np.array): (3,3) rows right, up, direction.
+        position (np.array): (3,) position of the pose.
+
+    Returns:
+        np.array: (3,3) rotated basis.
+    """
+    return face_origin_bases(basis, np.asarray(position, dtype=float)[None])[0]
+
+
+def rigid_arc_rotations(arc_angles_deg, tilt_angles_deg):
+    """
+    (P,3,3) rotations R_x(tilt) @ R_y(-arc) taking the start pose, at arc angle 0 on the x-axis, to each pose.
+
+    Args:
+        arc_angles_deg (np.array): (P,) arc angle of each pose.
+        tilt_angles_deg (np.array): (P,) tilt angle of each pose.
+    """
+    return (rotations_about_x(np.radians(tilt_angles_deg)) @
+            rotations_about_y(-np.radians(np.asarray(arc_angles_deg, dtype=float))))
+
+
+def rigid_arc_bases(start_basis, arc_angles_deg, tilt_angles_deg):
+    """
+    Basis of every pose of the rigid arc, facing the origin.
+
+    The arc lies in the x-z plane and is rotated about the x-axis by each tilt angle, as in rigid_arc_rotation().
+    The pose at arc angle a and tilt t is the start pose (at arc angle 0, on the x-axis) rotated by
+    R_x(t) @ R_y(-a), so each tilt rotates the whole arc of poses rigidly.
+
+    Args:
+        start_basis (np.array): (3,3) rows right, up, direction of the pose at arc angle 0, facing the origin.
+        arc_angles_deg (np.array): Arc angles, from rigid_arc_angles().
+        tilt_angles_deg (list): Tilt angles.
+
+    Returns:
+        np.array: (P,3,3) basis of each pose, for each tilt in turn and each arc angle within it.
+    """
+    rotations = rigid_arc_rotations(np.tile(arc_angles_deg, len(tilt_angles_deg)),
+                                    np.repeat(tilt_angles_deg, len(arc_angles_deg)))
+
+    # Row i of pose p is rotations[p] @ start_basis[i]
+    return np.einsum("ij,pkj->pik", start_basis, rotations)
+
+
+def rigid_arc_pose_arrays(start_basis, radius, arc_angles_deg, tilt_angles_deg):
+    """
+    Bases and positions of rigid arc poses at any pairs of arc and tilt angles, e.g. poses added by arc refinement.
+
+    Args:
+        start_basis (np.array): (3,3) rows right, up, direction of the pose at arc angle 0, facing the origin.
+        radius (float): Radius of the arc.
+        arc_angles_deg (np.array): (P,) arc angle of each pose.
+        tilt_angles_deg (np.array): (P,) tilt angle of each pose.
+
+    Returns:
+        bases (np.array): (P,3,3) rows right, up, direction of each pose.
+        positions (np.array): (P,3) position of each pose.
+    """
+    rotations = rigid_arc_rotations(arc_angles_deg, tilt_angles_deg)
+
+    return np.einsum("ij,pkj->pik", start_basis, rotations), radius * rotations[:, :, 0]
+
+
+def rigid_arc_poses(start_plane, all_positions, arc_resolution_deg, tilt_angles):
+    """
+    Poses of the rigid arc, computed in one shot from their arc and tilt angles.
+
+    Args:
+        start_plane (Plane): The source plane moved to the first arc position, from setup_initial_pose().
+        all_positions (np.array): (P,3) arc positions, from rigid_arc_rotation().
+        arc_resolution_deg (float): Angle increment along the arc.
+        tilt_angles (list): Tilt angles of the arc about the x-axis.
+
+    Returns:
+        PoseSequence: The poses.
+    """
+    positions = np.asarray(all_positions, dtype=float)
+    arc_angles = rigid_arc_angles(arc_resolution_deg)
+
+    if len(positions) != len(arc_angles) * len(tilt_angles):
+        raise ValueError(f"{len(positions)} arc positions for {len(arc_angles)} arc angles and "
+                         f"{len(tilt_angles)} tilt angles")
+
+    start_basis = np.vstack((start_plane.right, start_plane.up, start_plane.direction))
+    bases = rigid_arc_bases(face_origin(start_basis, positions[0]), arc_angles, tilt_angles)
+
+    logging.debug(f"Generated {len(bases)} rigid arc poses facing the origin")
+
+    return PoseSequence(bases, positions, start_plane.width, start_plane.length)
+
+
+def fibonacci_hemisphere_poses(start_plane, all_positions):
+    """
+    Poses at the points of a Fibonacci lattice on the hemisphere (see fibonacci_hemisphere()), facing the origin.
+
+    Each pose is the start plane turned to face the origin from the zenith, then tilted by the smallest rotation
+    from the zenith to its position, so poses have no roll about their direction relative to that frame.
+
+    Args:
+        start_plane (Plane): The source plane moved to the first position, from setup_initial_pose().
+        all_positions (np.array): (P,3) positions on the hemisphere.
+
+    Returns:
+        PoseSequence: The poses.
+    """
+    positions = np.asarray(all_positions, dtype=float)
+
+    start_basis = np.vstack((start_plane.right, start_plane.up, start_plane.direction))
+    zenith_basis = face_origin(start_basis, np.array([0.0, 0.0, 1.0]))
+    bases = face_origin_bases(zenith_basis, positions)
+
+    logging.debug(f"Generated {len(bases)} Fibonacci hemisphere poses facing the origin")
+
+    return PoseSequence(bases, positions, start_plane.width, start_plane.length)
+
+
+class PoseSequence:
+    """
+    Poses held as arrays. Indexing or iterating gives PoseView objects, so a PoseSequence can stand in for
+    the list of Plane objects from move_plane_along_arc().
+
+    Attributes:
+    bases (np.array): (P,3,3) rows right, up, direction of each pose.
+    positions (np.array): (P,3) position of each pose.
+    width (float): Width of the plane at every pose.
+    length (float): Length of the plane at every pose.
+    first_index (int): Index of the first pose in the whole sweep, when the sequence is a chunk of it.
+    """
+
+    def __init__(self, bases, positions, width, length, first_index=0):
+        self.bases = np.asarray(bases, dtype=float)
+        self.positions = np.asarray(positions, dtype=float)
+        self.width = width
+        self.length = length
+        self.first_index = first_index
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f"Pose {index} out of range for {len(self)} poses")
+        return PoseView(self, index)
+
+    def __iter__(self):
+        return (PoseView(self, index) for index in range(len(self)))
+
+    def chunk(self, start, stop):
+        """
+        PoseSequence of poses start to stop, sharing the arrays.
+        """
+        return PoseSequence(self.bases[start:stop], self.positions[start:stop], self.width, self.length,
+                            self.first_index + start)
+
+
+def pose_chunks(poses, chunk_size):
+    """
+    Splits a stream of poses into chunks, so a sweep is evaluated one chunk at a time.
+
+    A PoseSequence is sliced without copying. Any other iterable of planes, e.g. the generator from
+    move_plane_along_arc(), is only advanced one chunk at a time, so its earlier planes can be dropped.
+
+    Args:
+        poses: PoseSequence, or iterable of Plane objects.
+        chunk_size (int): Poses per chunk.
+
+    Yields:
+        start (int): Index of the chunk's first pose.
+        chunk: PoseSequence or list of planes.
+    """
+    chunk_size = max(1, int(chunk_size))
+
+    if isinstance(poses, PoseSequence):
+        for start in range(0, len(poses), chunk_size):
+            yield start, poses.chunk(start, start + chunk_size)
+        return
+
+    iterator = iter(poses)
+    start = 0
+    while True:
+        chunk = list(itertools.islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield start, chunk
+        start += len(chunk)
+
+
+class PoseView:
+    """
+    Read-only view of one pose of a PoseSequence, with the attributes and plotting methods of a Plane.
+    """
+    __slots__ = ("poses", "index", "colour")
+
+    def __init__(self, poses, index):
+        self.poses = poses
+        self.index = index
+        self.colour = None
+
+    @property
+    def title(self):
+        index = self.poses.first_index + self.index
+        return f"Plane {index} - Start" if index == 0 else f"Plane {index}"
+
+    @property
+    def position(self):
+        return self.poses.positions[self.index]
+
+    @property
+    def right(self):
+        return self.poses.bases[self.index, 0]
+
+    @property
+    def up(self):
+        return self.poses.bases[self.index, 1]
+
+    @property
+    def direction(self):
+        return self.poses.bases[self.index, 2]
+
+    @property
+    def width(self):
+        return self.poses.width
+
+    @property
+    def length(self):
+        return self.poses.length
+
+    @property
+    def corners(self):
+        """
+        (4,3) corners, in the order of Plane.update_corners().
+        """
+        half_right = self.width / 2 * self.right
+        half_up = self.length / 2 * self.up
+        return self.position + np.array([-half_right + half_up, half_right + half_up,
+                                         half_right - half_up, -half_right - half_up])
+
+    planes_plot_3d = Plane.planes_plot_3d
+    plot_area = Plane.plot_area
+    plot_axis = Plane.plot_axis
+    random_points = Plane.random_points
+    print_pose = Plane.print_pose
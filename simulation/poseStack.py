@@ -0,0 +1,142 @@
+import logging
+
+import numpy as np
+
+from batchIntersection import trace_rays, cull_poses
+from intersectionCalculations import rejected_rays
+from poseGenerator import PoseSequence
+from rayDump import fill_ray_outcomes
+
+# Approximate working memory per ray per pose while a chunk is traced (bytes):
+# origins, directions, aperture and sensor intersections (4 x 24), ray indices and masks (~40),
+# plus the (rays, areas, 2) containment table for each area.
+RAY_POSE_BYTES = 136
+RAY_POSE_AREA_BYTES = 3
+
+
+def stack_poses(planes):
+    """
+    Stacks the basis and position of each pose into arrays.
+
+    Args:
+        planes (list): Plane objects for each pose, e.g. from move_plane_along_arc(), or a PoseSequence.
+
+    Returns:
+        bases (np.array): (P,3,3) rows right, up, direction of each pose.
+        positions (np.array): (P,3) position of each pose.
+    """
+    if isinstance(planes, PoseSequence):  # Already stacked
+        return planes.bases, planes.positions
+
+    bases = np.array([np.vstack((plane.right, plane.up, plane.direction)) for plane in planes], dtype=float)
+    positions = np.array([plane.position for plane in planes], dtype=float)
+
+    return bases, positions
+
+
+def bounding_corners(points):
+    """
+    (8,3) corners of the axis aligned bounding box of a set of points.
+    """
+    lower, upper = points.min(axis=0), points.max(axis=0)
+
+    return np.array([[x, y, z] for x in (lower[0], upper[0]) for y in (lower[1], upper[1])
+                     for z in (lower[2], upper[2])])
+
+
+def poses_per_chunk(num_rays, num_areas, memory_budget_mb):
+    """
+    Number of poses that can be traced together within the memory budget (at least one).
+    """
+    bytes_per_pose = num_rays * (RAY_POSE_BYTES + RAY_POSE_AREA_BYTES * num_areas)
+
+    return max(1, int(memory_budget_mb * 1e6 // max(bytes_per_pose, 1)))
+
+
+def evaluate_pose_stack(sensorPlane, sensorAreas, aperturePlane, apertureAreas, local_positions, bases, positions,
+                        memory_budget_mb, ray_outcomes=None, heatmap=None, surfaces=()):
+    """
+    Evaluates the same set of rays at every pose, tracing chunks of poses together as one broadcast batch.
+    Poses whose rays cannot reach any aperture (see cull_poses()) are counted as all misses without tracing.
+
+    Args:
+        sensorPlane: The plane containing the sensors.
+        sensorAreas: List of all sensor objects.
+        aperturePlane: The plane containing the apertures.
+        apertureAreas: List of all aperture objects.
+        local_positions (np.array): (N,3) ray positions in the source plane's local coordinate system.
+        bases (np.array): (P,3,3) pose bases from stack_poses().
+        positions (np.array): (P,3) pose positions from stack_poses().
+        memory_budget_mb (float): Upper bound on the working memory of a chunk.
+        ray_outcomes (np.array): Optional (P,N) RAY_OUTCOME_DTYPE records (e.g. a RayDump memmap)
+            to fill with the outcome of every ray.
+        heatmap (SensorHeatmap): Optional (P, ny, nx) histogram of the sensor plane to accumulate.
+        surfaces (list): Optional Surface objects between the aperture plane and the sensor plane.
+
+    Returns:
+        hits (np.array): (P,) number of hits at each pose.
+        misses (np.array): (P,) number of misses at each pose.
+        illumination (np.array): (P,S) hits on each sensor at each pose.
+    """
+    num_poses = len(bases)
+    num_rays = len(local_positions)
+    num_sensors = len(sensorAreas)
+
+    chunk = poses_per_chunk(num_rays, max(len(sensorAreas), len(apertureAreas)), memory_budget_mb)
+    logging.info(f"Evaluating {num_poses} poses x {num_rays} rays in chunks of {chunk} poses")
+
+    illumination = np.zeros((num_poses, num_sensors), dtype=int)
+    misses = np.zeros(num_poses, dtype=int)
+
+    # Every ray of a culled pose is blocked at the aperture plane
+    corners = np.matmul(bounding_corners(local_positions), bases) + positions[:, None, :]
+    culled, rejection = cull_poses(aperturePlane, apertureAreas, corners, bases[:, 2], num_rays)
+    misses[culled] = num_rays
+    for reason in rejection:
+        if reason is not None:
+            rejected_rays[reason] += num_rays
+    if ray_outcomes is not None:
+        for pose_idx in np.flatnonzero(culled):
+            ray_outcomes[pose_idx] = (-1, -1, np.nan, np.nan)
+
+    for start in range(0, num_poses, chunk):
+        stop = min(start + chunk, num_poses)
+        num_chunk = stop - start
+
+        # Poses of the chunk left to trace, relative to start
+        traced = np.flatnonzero(~culled[start:stop])
+        if len(traced) == 0:
+            continue
+        chunk_bases = bases[start + traced]
+
+        # (C,N,3) global ray positions, local positions multiplied by each pose basis
+        origins = np.matmul(local_positions, chunk_bases) + positions[start + traced, None, :]
+        directions = np.broadcast_to(chunk_bases[:, None, 2, :], origins.shape)
+
+        aperture_index, sensor_index, intersection_coordinates = trace_rays(
+            sensorPlane, sensorAreas, aperturePlane, apertureAreas, origins.reshape(-1, 3), directions.reshape(-1, 3),
+            surfaces)
+
+        if ray_outcomes is not None:
+            if len(traced) == num_chunk:
+                fill_ray_outcomes(ray_outcomes[start:stop], sensorPlane, aperture_index, sensor_index,
+                                  intersection_coordinates)
+            else:  # Fancy indexing copies, so fill a block and write it back
+                outcomes = np.empty((len(traced), num_rays), dtype=ray_outcomes.dtype)
+                fill_ray_outcomes(outcomes, sensorPlane, aperture_index, sensor_index, intersection_coordinates)
+                ray_outcomes[start + traced] = outcomes
+
+        pose_index = np.repeat(traced, num_rays)
+        if heatmap is not None:
+            heatmap.accumulate_block(start, num_chunk, pose_index, aperture_index, intersection_coordinates)
+
+        hit = sensor_index >= 0
+        miss = (aperture_index < 0) | (~hit & (num_sensors > 0))
+
+        illumination[start:stop] = np.bincount(pose_index[hit] * num_sensors + sensor_index[hit],
+                                               minlength=num_chunk * num_sensors).reshape(num_chunk, num_sensors)
+        misses[start + traced] = np.bincount(pose_index[miss], minlength=num_chunk)[traced]
+
+        logging.debug(f"Evaluated poses {start} to {stop - 1}, {num_chunk - len(traced)} culled")
+
+    return illumination.sum(axis=1), misses, illumination
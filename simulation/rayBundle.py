@@ -0,0 +1,99 @@
+import numpy as np
+
+from line import Line
+
+
+class RayBundle:
+    """
+    Structure-of-arrays store for all rays emitted from a source plane.
+    Replaces a list of Line objects, keeping each per-ray quantity in one contiguous array.
+
+    Attributes:
+    local_positions (np.array): (N,3) ray positions in the source plane's local coordinate system.
+    positions (np.array): (N,3) global ray start positions for the current pose.
+    directions (np.array): (N,3) ray directions. All rays share the plane normal, so this is a
+        read-only broadcast view of a single vector and costs no memory per ray.
+    results (np.array): (N,) 1 for a hit, otherwise 0.
+    intersection_coordinates (np.array): (N,3) final intersection of each ray.
+    aperture_index (np.array): (N,) aperture each ray passed through, -1 if blocked.
+    sensor_index (np.array): (N,) sensor each ray hit, -1 if none.
+    """
+
+    def __init__(self, local_positions, direction):
+        """
+    Initialize a RayBundle instance.
+
+    Args:
+        local_positions (array): (N,3) positions in the plane's local coordinate system.
+        direction (array): The initial direction of every ray (same as plane's normal).
+    """
+        self.local_positions = np.ascontiguousarray(local_positions, dtype=float)
+        num_rays = len(self.local_positions)
+
+        self.positions = np.zeros((num_rays, 3))
+        self.directions = None
+        self.set_direction(direction)
+
+        self.results = np.zeros(num_rays, dtype=np.int8)
+        self.intersection_coordinates = np.full((num_rays, 3), np.nan)
+        self.aperture_index = np.full(num_rays, -1, dtype=np.int16)
+        self.sensor_index = np.full(num_rays, -1, dtype=np.int16)
+
+    @classmethod
+    def from_plane(cls, source_plane, num_lines, rng=None, strategy="uniform"):
+        """
+        Generates random ray positions in the plane's local coordinate system.
+        Bundle equivalent of create_lines_from_plane().
+
+        Args:
+            source_plane (Plane): The source plane object.
+            num_lines (int): Number of rays to generate.
+            rng (np.random.Generator): Random stream for the positions.
+            strategy (str): Sampling strategy, see Plane.random_points().
+
+        Returns:
+            RayBundle: Bundle of rays, with z = 0 in the plane's local coordinates.
+        """
+        points = source_plane.random_points(num_lines, rng, strategy)  # Local coordinates
+        local_positions = np.column_stack((points, np.zeros(len(points))))
+
+        return cls(local_positions, source_plane.direction)
+
+    def __len__(self):
+        return len(self.local_positions)
+
+    def __getitem__(self, line_id):
+        """
+        Builds a Line object for a single ray, so sampled rays can be visualised like Line objects.
+        """
+        line = Line(self.local_positions[line_id], self.directions[line_id], line_id=line_id)
+        line.position = self.positions[line_id]
+        line.result = self.results[line_id]
+        line.intersection_coordinates = self.intersection_coordinates[line_id]
+
+        return line
+
+    def set_direction(self, direction):
+        self.directions = np.broadcast_to(np.asarray(direction, dtype=float), (len(self), 3))
+
+    def update_global_positions(self, plane):
+        """
+        Updates the global positions of all rays for a transformed plane,
+        as one matrix multiply of the local positions with the plane's basis.
+
+        Args:
+            plane (Plane): The updated plane after movement.
+        """
+        basis = np.vstack((plane.right, plane.up, plane.direction))  # Rows are the local axes
+
+        np.matmul(self.local_positions, basis, out=self.positions)
+        self.positions += plane.position
+        self.set_direction(plane.direction)
+
+    @property
+    def nbytes(self):
+        """
+        Memory held by the per-ray arrays, in bytes.
+        """
+        return (self.local_positions.nbytes + self.positions.nbytes + self.results.nbytes +
+                self.intersection_coordinates.nbytes + self.aperture_index.nbytes + self.sensor_index.nbytes)
@@ -0,0 +1,116 @@
+import json
+import logging
+import os
+
+import numpy as np
+
+from batchIntersection import plane_coordinates
+
+# Outcome of one ray at one pose, 12 bytes:
+# sensor and aperture indices (-1 for none), and the intersection with the sensor plane in its local x/y
+# (NaN for rays blocked at the aperture plane)
+RAY_OUTCOME_DTYPE = np.dtype([("sensor", np.int16), ("aperture", np.int16), ("x", np.float32), ("y", np.float32)])
+
+
+def fill_ray_outcomes(outcomes, sensorPlane, aperture_index, sensor_index, intersection_coordinates):
+    """
+    Writes traced rays into a block of ray outcomes.
+
+    Args:
+        outcomes (np.array): RAY_OUTCOME_DTYPE records, any shape holding one record per traced ray
+            (e.g. rows of the dump memmap).
+        sensorPlane (Plane): The plane containing the sensors, giving the local x/y axes.
+        aperture_index, sensor_index, intersection_coordinates: As returned by trace_rays().
+    """
+    outcomes = outcomes.reshape(-1)
+    passed = aperture_index >= 0
+
+    x, y = plane_coordinates(sensorPlane, intersection_coordinates)
+    x = np.where(passed, x, np.nan)
+    y = np.where(passed, y, np.nan)
+
+    outcomes["sensor"] = sensor_index
+    outcomes["aperture"] = aperture_index
+    outcomes["x"] = x
+    outcomes["y"] = y
+
+
+class RayDump:
+    """
+    Per-ray outcomes of every pose of a run, in a preallocated memory-mapped file of shape (poses, rays).
+    Rows are written to disk as poses are evaluated, so the dump never has to fit in memory.
+
+    The file is raw RAY_OUTCOME_DTYPE records with a JSON metadata file next to it,
+    read back with load_ray_dump().
+
+    Attributes:
+    path (str): Path of the dump file.
+    outcomes (np.memmap): (P,N) ray outcomes.
+    """
+
+    def __init__(self, path, num_poses, num_rays, metadata=None):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        self.path = path
+        self.outcomes = np.memmap(path, dtype=RAY_OUTCOME_DTYPE, mode="w+", shape=(num_poses, num_rays))
+
+        metadata = dict(metadata or {})
+        metadata.update({"shape": [num_poses, num_rays], "fields": list(RAY_OUTCOME_DTYPE.names)})
+        with open(metadata_path(path), "w") as f:
+            json.dump(metadata, f, indent=2, default=str)
+
+        logging.info(f"Writing per-ray outcomes to {path} ({self.outcomes.nbytes / 1e6:.1f} MB)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def record_bundle(self, pose_idx, rays, sensorPlane):
+        """
+        Writes the outcome of every ray of an evaluated RayBundle for one pose.
+        """
+        fill_ray_outcomes(self.outcomes[pose_idx], sensorPlane, rays.aperture_index, rays.sensor_index,
+                          rays.intersection_coordinates)
+
+    def update_metadata(self, **entries):
+        """
+        Adds entries to the metadata file, e.g. pose titles only known once the poses have been evaluated.
+        """
+        with open(metadata_path(self.path), "r") as f:
+            metadata = json.load(f)
+        metadata.update(entries)
+        with open(metadata_path(self.path), "w") as f:
+            json.dump(metadata, f, indent=2, default=str)
+
+    def close(self):
+        if self.outcomes is not None:
+            self.outcomes.flush()
+            self.outcomes = None
+
+
+def metadata_path(path):
+    return os.path.splitext(path)[0] + ".json"
+
+
+def attach_ray_dump(path, shape):
+    """
+    Opens an existing dump for writing, e.g. from a worker process filling its own block of poses.
+    """
+    return np.memmap(path, dtype=RAY_OUTCOME_DTYPE, mode="r+", shape=tuple(shape))
+
+
+def load_ray_dump(path):
+    """
+    Opens a dump read-only, without loading it into memory.
+
+    Returns:
+        outcomes (np.memmap): (P,N) ray outcomes, RAY_OUTCOME_DTYPE records.
+        metadata (dict): Run description written with the dump.
+    """
+    with open(metadata_path(path), "r") as f:
+        metadata = json.load(f)
+
+    return np.memmap(path, dtype=RAY_OUTCOME_DTYPE, mode="r", shape=tuple(metadata["shape"])), metadata
@@ -0,0 +1,99 @@
+import csv
+import logging
+import os
+
+
+class ResultsSink:
+    """
+    Keeps the output CSV files open for a whole run, buffering rows in memory and writing them in bulk.
+
+    Each file is opened on its first write and closed by close(). Use as a context manager
+    so buffered rows are written even if the run raises:
+
+        with ResultsSink(flush_interval) as sink:
+            sink.write_rows("../data/results.csv", rows)
+
+    Attributes:
+    flush_interval (int): Buffered rows, across all files, that trigger a flush.
+    """
+
+    def __init__(self, flush_interval=1000):
+        self.flush_interval = flush_interval
+        self._files = {}
+        self._writers = {}
+        self._buffers = {}
+        self._buffered = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def _open(self, file_path, header, overwrite):
+        """
+        Opens a file for the rest of the run, truncating it and writing the header
+        if overwrite is set or the file does not exist yet, otherwise appending.
+        """
+        new_file = overwrite or not os.path.exists(file_path)
+
+        file = open(file_path, "w" if new_file else "a", newline="")
+        self._files[file_path] = file
+        self._writers[file_path] = csv.writer(file)
+        self._buffers[file_path] = []
+
+        if new_file and header is not None:
+            self._writers[file_path].writerow(header)
+
+    def write_row(self, file_path, row, header=None, overwrite=False):
+        self.write_rows(file_path, [row], header, overwrite)
+
+    def write_rows(self, file_path, rows, header=None, overwrite=False):
+        """
+        Buffers rows for a file.
+
+        Args:
+            file_path (str): Output CSV file.
+            rows (iterable): Rows, each a list of values.
+            header (list): Column titles, written when the file is created or overwritten.
+            overwrite (bool): Replace any existing file, only applies to the first write of the run.
+        """
+        if file_path not in self._files:
+            self._open(file_path, header, overwrite)
+
+        buffer = self._buffers[file_path]
+        size = len(buffer)
+        buffer.extend(rows)
+        self._buffered += len(buffer) - size
+
+        if self._buffered >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes all buffered rows to their files.
+        """
+        for file_path, buffer in self._buffers.items():
+            if buffer:
+                self._writers[file_path].writerows(buffer)
+                self._files[file_path].flush()
+                buffer.clear()
+
+        self._buffered = 0
+
+    def close(self):
+        """
+        Flushes and closes every open file. The sink can be reused afterwards, files are reopened on their next write.
+        """
+        try:
+            self.flush()
+        finally:
+            for file_path, file in self._files.items():
+                file.close()
+                logging.debug(f"Closed {file_path}")
+
+            self._files.clear()
+            self._writers.clear()
+            self._buffers.clear()
+            self._buffered = 0
@@ -0,0 +1,134 @@
+import logging
+import os
+import shutil
+import time
+
+import numpy as np
+
+from resultsSink import ResultsSink
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Optional, the store falls back to .npz parts
+    pa = None
+    pq = None
+
+RESULTS_BACKENDS = ("csv", "parquet", "npz")
+
+
+def store_directory(file_path):
+    """
+    Store directory of a table, next to the CSV file it replaces: ../data/results.csv -> ../data/store/results
+    """
+    data_dir, file_name = os.path.split(file_path)
+    return os.path.join(data_dir, "store", os.path.splitext(file_name)[0])
+
+
+class ColumnarSink:
+    """
+    Results sink writing each table as a directory of columnar part files instead of a CSV file.
+    Drop-in replacement for ResultsSink, the tables are addressed by their CSV paths.
+
+    Every flush writes one new part per table, Parquet if pyarrow is installed, otherwise a compressed .npz file
+    with one array per column. Parts are never rewritten, so appending costs the same however large the store is.
+    """
+
+    def __init__(self, flush_interval=1000, backend="parquet"):
+        if backend == "parquet" and pq is None:
+            logging.warning("pyarrow is not installed, writing the results store as .npz parts")
+            backend = "npz"
+
+        self.flush_interval = flush_interval
+        self.backend = backend
+        self._headers = {}
+        self._buffers = {}
+        self._buffered = 0
+        self._part_seq = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def _open(self, file_path, header, overwrite):
+        if header is None:
+            raise ValueError(f"The results store needs column titles for {file_path}")
+
+        directory = store_directory(file_path)
+        if overwrite and os.path.exists(directory):
+            shutil.rmtree(directory)
+        os.makedirs(directory, exist_ok=True)
+
+        self._headers[file_path] = list(header)
+        self._buffers[file_path] = []
+
+    def write_row(self, file_path, row, header=None, overwrite=False):
+        self.write_rows(file_path, [row], header, overwrite)
+
+    def write_rows(self, file_path, rows, header=None, overwrite=False):
+        """
+        Buffers rows for a table, see ResultsSink.write_rows(). The header is required, it names the columns.
+        """
+        if file_path not in self._headers:
+            self._open(file_path, header, overwrite)
+
+        buffer = self._buffers[file_path]
+        size = len(buffer)
+        buffer.extend(rows)
+        self._buffered += len(buffer) - size
+
+        if self._buffered >= self.flush_interval:
+            self.flush()
+
+    def _write_part(self, file_path, rows):
+        """
+        Writes buffered rows as one part file, named by time and a sequence number so the parts sort in write order
+        and stay unique where the clock is coarser than the flushes (about 15.6 ms on Windows).
+        """
+        header = self._headers[file_path]
+        columns = {title: np.asarray(column) for title, column in zip(header, zip(*rows))}
+        part_path = os.path.join(store_directory(file_path), f"part-{time.time_ns():020d}-{self._part_seq:06d}")
+        self._part_seq += 1
+
+        if self.backend == "parquet":
+            pq.write_table(pa.table(columns), part_path + ".parquet")
+        else:
+            np.savez_compressed(part_path + ".npz", **columns)
+
+    def flush(self):
+        for file_path, buffer in self._buffers.items():
+            if buffer:
+                self._write_part(file_path, buffer)
+                buffer.clear()
+
+        self._buffered = 0
+
+    def close(self):
+        """
+        Writes any buffered rows. Tables are reopened on their next write.
+        """
+        try:
+            self.flush()
+        finally:
+            self._headers.clear()
+            self._buffers.clear()
+            self._buffered = 0
+
+
+def create_results_sink(config):
+    """
+    Output sink for a run, selected by output.results_backend: "csv" for the legacy CSV files,
+    "parquet" or "npz" for the columnar store (read back with evaluation/utils_io.load_table()).
+    """
+    backend = config.output["results_backend"]
+    flush_interval = config.output["flush_interval"]
+
+    if backend not in RESULTS_BACKENDS:
+        raise ValueError(f"Unknown results backend '{backend}', expected one of {RESULTS_BACKENDS}")
+
+    if backend == "csv":
+        return ResultsSink(flush_interval)
+    return ColumnarSink(flush_interval, backend)
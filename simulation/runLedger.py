@@ -0,0 +1,133 @@
+import csv
+import hashlib
+import json
+import logging
+import os
+import time
+
+RUNS_FILE = "runs.csv"
+INDEX_FILE = "runs_index.json"
+RUNS_HEADER = ["sim", "runtime", "seed", "config hash", "ray count", "sim title", "started", "cull ratio"]
+
+
+def config_hash(config):
+    """
+    Short fingerprint of the full configuration, identical for runs with identical settings.
+    """
+    text = json.dumps(config.to_dict(), sort_keys=True, default=str)
+    return hashlib.sha256(text.encode()).hexdigest()[:16]
+
+
+def _last_line(file_path, block_size=4096):
+    """
+    Reads the last non-empty line of a text file without reading the rest of it.
+    """
+    with open(file_path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        end = f.tell()
+        data = b""
+
+        while end > 0:
+            start = max(0, end - block_size)
+            f.seek(start)
+            data = f.read(end - start) + data
+            end = start
+
+            lines = data.strip().splitlines()
+            if len(lines) > 1 or (lines and end == 0):
+                return lines[-1].decode()
+
+    return ""
+
+
+def _legacy_next_index(results_path):
+    """
+    Next simulation index of a results.csv written before the ledger existed, from its last row.
+    """
+    if results_path is None or not os.path.exists(results_path):
+        return 0
+
+    last_row = _last_line(results_path).split(",")
+    try:
+        return int(last_row[0]) + 1
+    except ValueError:  # Header only
+        return 0
+
+
+def start_run(data_dir, results_path=None):
+    """
+    Reserves the index of a new simulation.
+
+    The next free index is kept in runs_index.json, so starting a run does not depend on the size of the results.
+    Without an index file, it is recovered once from the last row of an existing results file.
+
+    Args:
+        data_dir (str): Directory holding the ledger.
+        results_path (str): Results file, only read when there is no index yet.
+
+    Returns:
+        int: Simulation index.
+    """
+    index_path = os.path.join(data_dir, INDEX_FILE)
+
+    if os.path.exists(index_path):
+        with open(index_path, "r") as f:
+            sim_idx = json.load(f)["next_sim"]
+    else:
+        sim_idx = _legacy_next_index(results_path)
+
+    # Write to a temporary file first, so an interrupted update never leaves a broken index
+    temp_path = index_path + ".tmp"
+    with open(temp_path, "w") as f:
+        json.dump({"next_sim": sim_idx + 1, "updated": time.strftime("%Y-%m-%d %H:%M:%S")}, f)
+    os.replace(temp_path, index_path)
+
+    logging.info(f"Starting simulation {sim_idx}")
+    return sim_idx
+
+
+def _upgrade_runs_file(runs_path):
+    """
+    Rewrites a runs.csv written with fewer columns than RUNS_HEADER, leaving the new columns of old rows empty.
+    Only the header is read unless the file needs upgrading, so recording a run does not depend on the history size.
+    """
+    with open(runs_path, "r", newline="") as f:
+        header = next(csv.reader([f.readline()]), [])
+
+    if not header or header == RUNS_HEADER:
+        return
+
+    with open(runs_path, "r", newline="") as f:
+        rows = list(csv.reader(f))
+
+    temp_path = runs_path + ".tmp"
+    with open(temp_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(RUNS_HEADER)
+        writer.writerows(row + [""] * (len(RUNS_HEADER) - len(row)) for row in rows[1:])
+    os.replace(temp_path, runs_path)
+
+    logging.info(f"Added the {RUNS_HEADER[len(rows[0]):]} columns to {runs_path}")
+
+
+def record_run(data_dir, sim_idx, runtime, config, num_lines, cull_ratio=None):
+    """
+    Appends one row describing a finished simulation to runs.csv.
+    Structure: [sim, runtime, seed, config hash, ray count, sim title, started, cull ratio]
+
+    Args:
+        cull_ratio (float): Fraction of rays culled against the aperture bounds, empty if not known.
+    """
+    runs_path = os.path.join(data_dir, RUNS_FILE)
+    write_header = not os.path.exists(runs_path)
+    if not write_header:
+        _upgrade_runs_file(runs_path)
+
+    started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(time.time() - runtime))
+
+    with open(runs_path, "a", newline="") as f:
+        writer = csv.writer(f)
+        if write_header:
+            writer.writerow(RUNS_HEADER)
+        writer.writerow([sim_idx, f"{runtime:.4f}", config.simulation.get("seed"), config_hash(config), num_lines,
+                         config.output["Sim_title"], started, f"{cull_ratio:.4f}" if cull_ratio is not None else ""])
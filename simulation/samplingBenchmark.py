@@ -0,0 +1,112 @@
+"""
+Convergence benchmark for the ray sampling strategies of Plane.random_points().
+
+For a set of source poses around the rigid arc, the per-sensor hit fraction is estimated with increasing
+ray counts for each strategy, and compared against the exact fraction from analyticOverlap.
+The mean squared error over repeated runs (the estimator variance) is printed and plotted against ray count.
+
+Run from the simulation directory:
+    python samplingBenchmark.py
+"""
+import argparse
+
+import numpy as np
+import matplotlib.pyplot as plt
+
+from config import Config
+from plane import Plane, SAMPLING_STRATEGIES
+from areas import Areas
+from rayBundle import RayBundle
+from batchIntersection import evaluate_ray_bundle
+from analyticOverlap import expected_illumination
+from seeding import ray_generator
+
+
+def benchmark_poses(config, arc_angles):
+    """
+    Source planes on the rigid arc (tilt 0), facing the origin.
+    """
+    radius = config.arc_movement["radius"]
+    source = config.planes["source_plane"]
+
+    poses = []
+    for angle in np.radians(arc_angles):
+        position = radius * np.array([np.cos(angle), 0, np.sin(angle)])
+        poses.append(Plane(f"Arc {np.degrees(angle):.0f}", position, -position, source["width"], source["length"]))
+
+    return poses
+
+
+def sampling_convergence(config, ray_counts, repeats, strategies=SAMPLING_STRATEGIES, arc_angles=(60, 75, 90, 105, 120)):
+    """
+    Estimates the variance of the per-sensor hit fraction against ray count for each sampling strategy.
+
+    Returns:
+        dict: strategy -> (len(ray_counts),) mean squared error of the hit fraction,
+            averaged over poses, sensors and repeats.
+    """
+    sensorPlane = Plane("Sensor Plane", **config.planes["sensor_plane"])
+    aperturePlane = Plane("Aperture Plane", **config.planes["aperture_plane"])
+    sensorAreas = [Areas(**area) for area in config.sensor_areas.values()]
+    apertureAreas = [Areas(**area) for area in config.aperture_areas.values()]
+
+    poses = benchmark_poses(config, arc_angles)
+    expected = [expected_illumination(pose, sensorPlane, sensorAreas, aperturePlane, apertureAreas) for pose in poses]
+
+    seed = config.simulation.get("seed") or 0
+    errors = {}
+
+    for strategy in strategies:
+        errors[strategy] = np.zeros(len(ray_counts))
+
+        for count_idx, num_rays in enumerate(ray_counts):
+            squared_error = []
+
+            for repeat in range(repeats):
+                for pose, exact in zip(poses, expected):
+                    rays = RayBundle.from_plane(pose, num_rays, ray_generator(seed, repeat), strategy)
+                    rays.update_global_positions(pose)
+                    evaluate_ray_bundle(sensorPlane, sensorAreas, aperturePlane, apertureAreas, rays)
+
+                    estimate = np.array([sensor.illumination for sensor in sensorAreas]) / num_rays
+                    squared_error.extend((estimate - exact) ** 2)
+
+            errors[strategy][count_idx] = np.mean(squared_error)
+
+    return errors
+
+
+def print_convergence(ray_counts, errors):
+    print(f"{'Rays':>8} " + " ".join(f"{strategy:>12}" for strategy in errors))
+    for count_idx, num_rays in enumerate(ray_counts):
+        print(f"{num_rays:>8} " + " ".join(f"{errors[strategy][count_idx]:>12.3e}" for strategy in errors))
+
+
+def plot_convergence(ray_counts, errors):
+    fig, ax = plt.subplots(figsize=(8, 5))
+
+    for strategy, mse in errors.items():
+        ax.loglog(ray_counts, mse, marker="o", label=strategy)
+
+    ax.set_title("Sampling Strategy Convergence")
+    ax.set_xlabel("Ray Count")
+    ax.set_ylabel("Variance of Sensor Hit Fraction")
+    ax.legend()
+    ax.grid(True, which="both")
+    plt.tight_layout()
+    plt.show()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the convergence of the ray sampling strategies")
+    parser.add_argument("--config", default="../config.json", help="Path to the JSON config file")
+    parser.add_argument("--repeats", type=int, default=20, help="Independent runs per ray count")
+    parser.add_argument("--no-plot", action="store_true", help="Only print the results table")
+    args = parser.parse_args()
+
+    counts = [256, 512, 1024, 2048, 4096, 8192]
+    results = sampling_convergence(Config(file_path=args.config), counts, args.repeats)
+
+    print_convergence(counts, results)
+    if not args.no_plot:
+        plot_convergence(counts, results)
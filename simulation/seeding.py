@@ -0,0 +1,62 @@
+import logging
+
+import numpy as np
+
+# Stream kinds, the second entry of each spawn key keeps the streams of one run independent
+RAY_STREAM = 0
+POSE_STREAM = 1
+POSE_RAY_STREAM = 2
+
+
+def resolve_root_seed(config):
+    """
+    Returns the root seed of the simulation from config.simulation["seed"].
+
+    If no seed is configured, fresh entropy is drawn and stored in the config, so every stream of the
+    current session derives from it and the run can be reproduced by copying the logged value into the config.
+    """
+    seed = config.simulation.get("seed")
+
+    if seed is None:
+        seed = int(np.random.SeedSequence().entropy)
+        config.simulation["seed"] = seed
+        logging.info(f"No seed configured, using generated root seed {seed}")
+
+    return seed
+
+
+def ray_generator(seed, run_idx):
+    """
+    Random generator for the ray positions of one simulation run.
+
+    Args:
+        seed (int): Root seed.
+        run_idx (int): Index of the run within run_all_test().
+
+    Returns:
+        np.random.Generator
+    """
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(run_idx, RAY_STREAM)))
+
+
+def pose_generator(seed, run_idx, pose_idx):
+    """
+    Random generator for everything drawn at a single pose of a run (e.g. rays sampled for visualisation).
+
+    The stream depends only on the seed, run and pose index, so results do not change
+    with the order in which poses are evaluated or how they are split between worker processes.
+
+    Returns:
+        np.random.Generator
+    """
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(run_idx, POSE_STREAM, pose_idx)))
+
+
+def pose_ray_generator(seed, run_idx, pose_idx):
+    """
+    Random generator for rays drawn separately at each pose (adaptive ray counts).
+
+    Returns:
+        np.random.Generator
+    """
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(run_idx, POSE_RAY_STREAM, pose_idx)))
@@ -0,0 +1,111 @@
+import copy
+import logging
+import os
+
+import numpy as np
+
+from batchIntersection import plane_coordinates
+
+
+class SensorHeatmap:
+    """
+    Per-pose 2D histogram of where rays passing the apertures cross the sensor plane,
+    on a fixed grid over the sensor plane's width and length (in its local x/y coordinates).
+
+    Counts include rays landing between sensors, so any sensor layout on the plane
+    can be evaluated afterwards by summing the cells it covers.
+
+    Attributes:
+    counts (np.array): (P, ny, nx) rays landing in each cell at each pose.
+    x_edges (np.array): (nx+1,) cell boundaries along sensorPlane.right.
+    y_edges (np.array): (ny+1,) cell boundaries along sensorPlane.up.
+    """
+
+    def __init__(self, sensorPlane, num_poses, bins):
+        """
+    Args:
+        sensorPlane (Plane): The plane containing the sensors.
+        num_poses (int): Number of poses.
+        bins (list): Number of cells along the plane's width and length, [nx, ny].
+    """
+        self.sensorPlane = sensorPlane
+        self.nx, self.ny = int(bins[0]), int(bins[1])
+
+        self.x_edges = np.linspace(-sensorPlane.width / 2, sensorPlane.width / 2, self.nx + 1)
+        self.y_edges = np.linspace(-sensorPlane.length / 2, sensorPlane.length / 2, self.ny + 1)
+        self.counts = np.zeros((num_poses, self.ny, self.nx), dtype=np.int32)
+
+    def window(self, start, stop):
+        """
+        Heatmap of poses start to stop, indexed from 0 and sharing this heatmap's counts,
+        for evaluating one chunk of poses at a time.
+        """
+        window = copy.copy(self)
+        window.counts = self.counts[start:stop]
+        return window
+
+    def cell_index(self, aperture_index, intersection_coordinates):
+        """
+        Flat cell index (iy * nx + ix) of each traced ray, -1 for rays blocked at the aperture plane
+        or landing outside the sensor plane.
+        """
+        x, y = plane_coordinates(self.sensorPlane, intersection_coordinates)
+
+        # Scale to cell units, NaN and out of range values are rejected below
+        with np.errstate(invalid="ignore"):
+            ix = (x + self.sensorPlane.width / 2) * (self.nx / self.sensorPlane.width)
+            iy = (y + self.sensorPlane.length / 2) * (self.ny / self.sensorPlane.length)
+            valid = (aperture_index >= 0) & (ix >= 0) & (ix < self.nx) & (iy >= 0) & (iy < self.ny)
+
+        cells = np.full(len(x), -1)
+        cells[valid] = iy[valid].astype(int) * self.nx + ix[valid].astype(int)
+
+        return cells
+
+    def accumulate(self, pose_idx, aperture_index, intersection_coordinates):
+        """
+        Adds the rays traced at one pose, e.g. the aperture_index and intersection_coordinates of a RayBundle.
+        """
+        cells = self.cell_index(aperture_index, intersection_coordinates)
+        cells = cells[cells >= 0]
+
+        self.counts[pose_idx] += np.bincount(cells, minlength=self.nx * self.ny).reshape(self.ny, self.nx)
+
+    def accumulate_block(self, start, num_block, pose_index, aperture_index, intersection_coordinates):
+        """
+        Adds rays traced at several poses together, as in evaluate_pose_stack().
+
+        Args:
+            start (int): First pose of the block.
+            num_block (int): Number of poses in the block.
+            pose_index (np.array): (N,) pose of each ray, relative to start.
+        """
+        cells = self.cell_index(aperture_index, intersection_coordinates)
+        landed = cells >= 0
+        num_cells = self.nx * self.ny
+
+        block = np.bincount(pose_index[landed] * num_cells + cells[landed], minlength=num_block * num_cells)
+        self.counts[start:start + num_block] += block.reshape(num_block, self.ny, self.nx)
+
+    def save(self, path, metadata=None):
+        """
+        Saves the counts and the grid as a compressed .npz file, read back with load_heatmap().
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        np.savez_compressed(path, counts=self.counts, x_edges=self.x_edges, y_edges=self.y_edges,
+                            plane_position=self.sensorPlane.position, plane_right=self.sensorPlane.right,
+                            plane_up=self.sensorPlane.up, **(metadata or {}))
+        logging.info(f"Saved sensor plane heatmap {self.counts.shape} to {path}")
+
+
+def load_heatmap(path):
+    """
+    Loads a saved heatmap.
+
+    Returns:
+        dict: counts (P, ny, nx), x_edges, y_edges, the sensor plane's position, right and up vectors
+            (local to global: position + x * right + y * up), and any saved metadata.
+    """
+    with np.load(path) as data:
+        return {key: data[key] for key in data.files}
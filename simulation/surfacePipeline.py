@@ -0,0 +1,57 @@
+import logging
+
+from areas import Areas
+from plane import Plane
+
+# "pass" surfaces only let rays through their areas (apertures),
+# "block" surfaces stop rays hitting their areas and let the rest through (masks, baffles)
+SURFACE_MODES = ("pass", "block")
+
+
+class Surface:
+    """
+    One stage of the stack of surfaces rays cross between the aperture plane and the sensor plane.
+
+    Attributes:
+    title (str): Name of the surface.
+    plane (Plane): The plane the surface lies on.
+    areas (list): Areas objects on the plane, the openings of a "pass" surface or the obstacles of a "block" surface.
+    mode (str): One of SURFACE_MODES.
+    """
+
+    def __init__(self, title, plane, areas, mode="pass"):
+        if mode not in SURFACE_MODES:
+            raise ValueError(f"Unknown surface mode '{mode}' for {title}, expected one of {SURFACE_MODES}")
+
+        self.title = title
+        self.plane = plane
+        self.areas = areas
+        self.mode = mode
+
+    @property
+    def blocking(self):
+        return self.mode == "block"
+
+
+def initialise_surfaces(config):
+    """
+    Builds the ordered stack of surfaces listed in the config, traced after the aperture plane.
+
+    Each entry of config.surfaces holds a title, a plane (as in config.planes), a mode and its areas
+    (as in config.aperture_areas):
+        {"title": "Baffle", "mode": "block", "plane": {"position": [0, 0, 0.5], "direction": [0, 0, 1],
+         "width": 10, "length": 10}, "areas": {"baffle_A": {"title": "Baffle A", ...}}}
+
+    Returns:
+        list: Surface objects, in the order rays cross them.
+    """
+    surfaces = []
+    for idx, entry in enumerate(config.surfaces):
+        title = entry.get("title", f"Surface {idx}")
+        plane = Plane(title, **entry["plane"])
+        areas = [Areas(**area) for area in entry.get("areas", {}).values()]
+
+        surfaces.append(Surface(title, plane, areas, entry.get("mode", "pass")))
+        logging.info(f"Surface {idx}: {title} ({surfaces[-1].mode}, {len(areas)} areas)")
+
+    return surfaces